@@ -1,21 +1,61 @@
+import collections, itertools, os.path, re
 from itertools import zip_longest
 from kg.checkers import * ### @import
 
+CHUNK = 1 << 20
+WINDOW = 64
+
 def is_exactly_equal(seq1, seq2):
     return all(val1 == val2 for val1, val2 in zip_longest(seq1, seq2))
 
+def files_are_identical(path1, path2):
+    ### @@ rem {
+    # Compare two files byte by byte, a chunk at a time. Only pure ASCII files count as identical here, since anything
+    # else still has to be decoded (which may fail) to get the same verdict as comparing the lines.
+    ### @@ }
+    if not (isinstance(path1, str) and isinstance(path2, str)): return False
+    try:
+        if os.path.getsize(path1) != os.path.getsize(path2): return False
+        with open(path1, 'rb') as file1, open(path2, 'rb') as file2:
+            while True:
+                chunk1 = file1.read(CHUNK)
+                chunk2 = file2.read(CHUNK)
+                if chunk1 != chunk2 or not chunk1.isascii(): return False
+                if not chunk1: return True
+    except OSError:
+        return False
+
+def find_mismatch(seq1, seq2, *, context=WINDOW):
+    ### @@ rem {
+    # Return None if the sequences are equal. Otherwise, return the index of the first mismatch, the (at most 'context')
+    # lines before it, and the mismatched values (None if that sequence ended).
+    ### @@ }
+    before = collections.deque(maxlen=context)
+    for index, (val1, val2) in enumerate(zip_longest(seq1, seq2)):
+        if val1 != val2: return index, [*before], val1, val2
+        before.append(val1)
+
+_hunk_re = re.compile(r'@@ -(\d+)((?:,\d+)?) \+(\d+)((?:,\d+)?) @@')
+
+def diff_excerpt(before, lines1, lines2, *, offset, **kwargs):
+    # unified diff of a window of lines, with the hunk line numbers shifted to where the window starts ### @rem
+    import difflib
+    return [_hunk_re.sub(lambda m: f'@@ -{int(m[1]) + offset}{m[2]} +{int(m[3]) + offset}{m[4]} @@', line)
+            if line.startswith('@@') else line
+            for line in difflib.unified_diff(before + lines1, before + lines2, **kwargs)]
+
 @checker(extra_chars_allowed=['input'])
 @default_score
-def check_exactly_equal(input_file, output_file, judge_file, **kwargs):
-    output_lines = list(output_file)
-    judge_lines = list(judge_file)
-    if not is_exactly_equal(output_lines, judge_lines):
+def check_lines_exactly_equal(input_file, output_file, judge_file, **kwargs):
+    mismatch = find_mismatch(output_file, judge_file)
+    if mismatch is not None:
         ### @@if format not in ('pg', 'hr', 'cms') {
         if 'output_path' in kwargs and 'judge_path' in kwargs:
-            import difflib
-            diff = '\n'.join(difflib.unified_diff(
-                output_lines,
-                judge_lines,
+            index, before, output_line, judge_line = mismatch
+            output_lines = [*([output_line] if output_line is not None else []), *itertools.islice(output_file, WINDOW)]
+            judge_lines = [*([judge_line] if judge_line is not None else []), *itertools.islice(judge_file, WINDOW)]
+            diff = '\n'.join(diff_excerpt(before, output_lines, judge_lines,
+                offset=index - len(before),
                 fromfile='Output File',
                 tofile='Judge File',
             ))
@@ -29,4 +69,9 @@ def check_exactly_equal(input_file, output_file, judge_file, **kwargs):
         ### @@ }
         raise Wrong('Incorrect.')
 
+def check_exactly_equal(input_file, output_file, judge_file, **kwargs):
+    # identical files are accepted without splitting them into lines ### @rem
+    if files_are_identical(kwargs.get('output_path'), kwargs.get('judge_path')): return 1.0
+    return check_lines_exactly_equal(input_file, output_file, judge_file, **kwargs)
+
 if __name__ == '__main__': check_files(check_exactly_equal, help="Exact diff checker")
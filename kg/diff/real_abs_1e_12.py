@@ -3,34 +3,71 @@
 
 # Don't edit this file. Edit real_abs_rel_template.py instead, and then run _real_check_gen.py
 
-from itertools import zip_longest
+import re
+from itertools import repeat, zip_longest
+from math import inf
+from operator import add, sub
 from decimal import Decimal, InvalidOperation
 from kg.checkers import * ### @import
 
 EPS = Decimal('1e-12') 
 
 EPS *= 1+Decimal('1e-5') # add some leniency
+
+BATCH = 1 << 12
+
+not_real_re = re.compile(r'[^0-9.eE+\-]')
+
+def float_error_bounds(values1, values2):
+    if not_real_re.search(''.join(values1)) or not_real_re.search(''.join(values2)): return None
+    try:
+        f1 = [*map(float, values1)]
+        f2 = [*map(float, values2)]
+    except ValueError:
+        return None
+    size = max(max(f1), -min(f1)) + max(max(f2), -min(f2))
+    if not size < 1e300: return None
+    return [*map(add, map(abs, map(sub, f1, f2)), repeat(size * 2**-50 + 1e-300))]
+
 @checker(extra_chars_allowed=['input'])
 @default_score
 def check_real(input_file, output_file, judge_file, **kwargs):
     worst = 0
+    bound = 0.0
+    values1, values2 = [], []
+    def check_batch():
+        nonlocal worst, bound
+        batch1, batch2 = values1[:], values2[:]
+        values1.clear()
+        values2.clear()
+        if not batch1: return
+        uppers = float_error_bounds(batch1, batch2)
+        if uppers is None: uppers = repeat(inf)
+        elif max(uppers) < bound: return
+        for v1, v2, upper in zip(batch1, batch2, uppers):
+            if v1 != v2 and upper >= bound:
+                try:
+                    v1, v2 = Decimal(v1), Decimal(v2)
+                except InvalidOperation as ex:
+                    raise Wrong(f"Unequal tokens that are not numbers: {v1!r} != {v2!r}") from ex
+                else:
+                    err = abs_error(v1, v2) 
+                    worst = max(worst, err)
+                    if err > EPS:
+                        raise Wrong(f"Not within the required precision: got error {err}")
+                    bound = float(worst) * (1 - 2**-50)
     try:
-        for line1, line2 in zip_longest(output_file, judge_file):
-            if (line1 is None) != (line2 is None): raise Wrong("Unequal number of lines")
-            p1 = line1.rstrip().split(" ")
-            p2 = line2.rstrip().split(" ")
-            if len(p1) != len(p2): raise Wrong("Incorrect number of values in line")
-            for v1, v2 in zip(p1, p2):
-                if v1 != v2:
-                    try:
-                        v1, v2 = Decimal(v1), Decimal(v2)
-                    except InvalidOperation as ex:
-                        raise Wrong(f"Unequal tokens that are not numbers: {v1!r} != {v2!r}") from ex
-                    else:
-                        err = abs_error(v1, v2) 
-                        worst = max(worst, err)
-                        if err > EPS:
-                            raise Wrong(f"Not within the required precision: got error {err}")
+        try:
+            for line1, line2 in zip_longest(output_file, judge_file):
+                if (line1 is None) != (line2 is None): raise Wrong("Unequal number of lines")
+                p1 = line1.rstrip().split(" ")
+                p2 = line2.rstrip().split(" ")
+                if len(p1) != len(p2): raise Wrong("Incorrect number of values in line")
+                values1 += p1
+                values2 += p2
+                if len(values1) >= BATCH: check_batch()
+        finally:
+            check_batch()
     finally:
         ...
         print('Worst error found:', worst) ### @if format not in ('pg', 'hr', 'cms')
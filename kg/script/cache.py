@@ -0,0 +1,273 @@
+from functools import lru_cache
+import hashlib
+import json
+import os
+import os.path
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from .utils import *
+
+_CHUNK = 1 << 20
+
+def file_hash(path):
+    ''' the sha256 of the contents of a file '''
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def data_hash(*parts):
+    ''' the sha256 of some json-serializable data '''
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+def program_hash(program):
+    '''
+    A hash of a program: its commands, and the contents of its file and of the files mentioned in its run command
+    (e.g., a compiled binary, or the interpreter). It changes whenever the program (probably) behaves differently.
+    '''
+    if not hasattr(program, '_content_hash'):
+        parts = [program.filename, program.compile, program.run]
+        for path in [program.rel_filename, *(attach_relpath(program.relpath, part) for part in program.run)]:
+            if os.path.isfile(path): parts.append([path, file_hash(path)])
+        program._content_hash = data_hash(*parts)
+    return program._content_hash
+
+
+def user_cache_dir():
+    ''' the directory of the caches shared by all problems: $KG_CACHE_DIR, or kg/ in the user's cache directory '''
+    return os.environ.get('KG_CACHE_DIR') or os.path.join(
+            os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'kg')
+
+
+class Cache:
+    '''
+    A persistent cache in a directory (usually .kgcache/). Each entry has a key (see data_hash), some json metadata,
+    and possibly some files. Entries are never modified after they're written, so they can be shared across threads.
+
+    If max_size (in bytes) is given, the least recently used entries are removed whenever the cache grows beyond it.
+    '''
+    def __init__(self, loc, name, *, max_size=None):
+        self.dir = os.path.join(loc, '.kgcache', name)
+        self.max_size = max_size
+
+    def _entry(self, key):
+        return os.path.join(self.dir, key[:2], key)
+
+    def get(self, key, **files):
+        '''
+        Return the metadata of the entry (or None if it doesn't exist), and copy its files to the given destinations,
+        e.g., cache.get(key, output='path/to/output')
+        '''
+        entry = self._entry(key)
+        try:
+            with open(os.path.join(entry, 'meta.json')) as f:
+                meta = json.load(f)
+            for name, dest in files.items():
+                shutil.copyfile(os.path.join(entry, name), dest)
+        except (OSError, ValueError):
+            return None
+        if self.max_size is not None:
+            # the modification time of meta.json is the last time the entry was used
+            try:
+                os.utime(os.path.join(entry, 'meta.json'))
+            except OSError:
+                pass
+        return meta
+
+    def put(self, key, meta, **files):
+        ''' Add an entry with the given metadata and copies of the files, e.g., cache.put(key, meta, output=path) '''
+        entry = self._entry(key)
+        if os.path.isdir(entry): return
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        # write everything somewhere else first, so that incomplete entries are never seen
+        tmp = tempfile.mkdtemp(prefix='kg_tmp_cache_', dir=os.path.dirname(entry))
+        try:
+            for name, src in files.items():
+                shutil.copyfile(src, os.path.join(tmp, name))
+            with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+                json.dump(meta, f)
+            os.rename(tmp, entry)
+        except OSError:
+            pass  # most likely, another thread wrote the same entry first
+        finally:
+            if os.path.isdir(tmp): shutil.rmtree(tmp, ignore_errors=True)
+        if self.max_size is not None: self.evict()
+
+    def evict(self):
+        ''' remove the least recently used entries until the cache is within max_size '''
+        entries = []
+        for root, dirs, files in os.walk(self.dir):
+            if 'meta.json' in files and not os.path.basename(root).startswith('kg_tmp_'):
+                try:
+                    used = os.path.getmtime(os.path.join(root, 'meta.json'))
+                    size = sum(os.path.getsize(os.path.join(root, file)) for file in files)
+                except OSError:
+                    continue  # just removed by someone else
+                entries.append((used, size, root))
+                dirs.clear()
+        total = sum(size for used, size, entry in entries)
+        for used, size, entry in sorted(entries):
+            if total <= self.max_size: break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+
+# the compilers that the compile cache knows, by the name of the command (e.g., g++-12, python3.11, javac.exe)
+_toolchains = [
+    (re.compile(r'([\w.-]+-)?(gcc|g\+\+|cc|c\+\+|clang|clang\+\+)(-[\d.]+)?(\.exe)?'), 'c'),
+    (re.compile(r'javac(\.exe)?'), 'java'),
+    (re.compile(r'(python|pypy)[\d.]*(\.exe)?'), 'python'),
+]
+
+def toolchain(command):
+    ''' 'c', 'java' or 'python', if the command is a compiler that the compile cache knows, otherwise None '''
+    name = os.path.basename(command)
+    for pattern, toolchain in _toolchains:
+        if pattern.fullmatch(name): return toolchain
+    return None
+
+@lru_cache(maxsize=None)
+def compiler_version(command):
+    '''
+    the output of "command --version" (which should identify the compiler), or None if that fails. Only call this
+    for a known toolchain, since this runs the command.
+    '''
+    try:
+        return subprocess.run([command, '--version'], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT, timeout=30, check=True).stdout.decode(errors='replace')
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+_include = re.compile(r'^\s*#\s*include\s*"([^"]+)"', re.MULTILINE)
+
+def _local_includes(path, found):
+    ''' the files that a C/C++ file includes with #include "...", recursively (the system headers are skipped) '''
+    with open(path, errors='replace') as f:
+        source = f.read()
+    for name in _include.findall(source):
+        include = os.path.normpath(os.path.join(os.path.dirname(path), name))
+        if include not in found and os.path.isfile(include):
+            found.add(include)
+            _local_includes(include, found)
+    return found
+
+
+class CompileCache(Cache):
+    '''
+    The programs compiled by kg, shared by all problems (in $KG_CACHE_DIR/compile, ~/.cache/kg/compile by default).
+    Only the programs compiled by a known toolchain (see _toolchains) are cached, since their sources and outputs are
+    known: a C/C++ file and its local #includes, or all the .java files in the folder, etc. Each entry is keyed by the
+    sources, the compile and run commands, and the compiler's version, and holds the files that the compile command
+    made, e.g., sol.exe or *.class. It's limited to $KG_COMPILE_CACHE_SIZE megabytes (default 512), and setting that
+    to 0 turns it off.
+    '''
+    def __init__(self):
+        try:
+            max_size = int(float(os.environ.get('KG_COMPILE_CACHE_SIZE', 512)) * (1 << 20))
+        except ValueError:
+            max_size = 512 << 20
+        super().__init__('', 'compile', max_size=max_size)
+        self.dir = os.path.join(user_cache_dir(), 'compile')
+
+    def key(self, program):
+        ''' the key of the program, or None if it shouldn't be cached '''
+        if self.max_size <= 0 or not os.path.isfile(program.rel_filename): return None
+        lang = toolchain(program.compile[0])
+        if lang is None: return None
+        version = compiler_version(program.compile[0])
+        if version is None: return None
+        sources = [program.rel_filename]
+        if lang == 'c':
+            sources += sorted(_local_includes(program.rel_filename, set()))
+        elif lang == 'java':
+            # javac also compiles the other classes it uses, from the same folder
+            folder = os.path.dirname(program.rel_filename) or '.'
+            sources = sorted(os.path.join(folder, name) for name in os.listdir(folder) if name.endswith('.java'))
+        return data_hash('compile', program.filename, program.compile, program.run, version,
+                *([os.path.relpath(source, program.relpath or '.'), file_hash(source)] for source in sources))
+
+    def outputs(self, program):
+        '''
+        The files that compiling the program might make, with their modification times and sizes: those in its run
+        command (e.g., ./sol.exe), those named after it (e.g., sol.exe, Sol$Inner.class), and for Java, all the
+        .class files in its folder.
+        '''
+        base = os.path.splitext(os.path.basename(program.filename))[0]
+        java = toolchain(program.compile[0]) == 'java'
+        def made(name):
+            return re.split(r'[.$]', name)[0] == base or java and name.endswith('.class')
+
+        paths = {attach_relpath(program.relpath, part) for part in program.run}
+        for folder in {program.relpath or '.', os.path.dirname(program.rel_filename) or '.'}:
+            if os.path.isdir(folder):
+                paths |= {os.path.join(folder, name) for name in os.listdir(folder) if made(name)}
+        outputs = {}
+        for path in map(os.path.normpath, paths):
+            if path != os.path.normpath(program.rel_filename) and os.path.isfile(path):
+                info = os.stat(path)
+                outputs[path] = info.st_mtime_ns, info.st_size
+        return outputs
+
+    def restore(self, key, cwd):
+        ''' copy the files of the entry to where they were made (relative to cwd); returns whether it's a hit '''
+        meta = self.get(key)
+        if meta is None: return False
+        files = {f'file{index}': attach_relpath(cwd, name) for index, (name, mode) in enumerate(meta['files'])}
+        for dest in files.values(): os.makedirs(os.path.dirname(dest) or '.', exist_ok=True)
+        if self.get(key, **files) is None: return False
+        for dest, (name, mode) in zip(files.values(), meta['files']):
+            os.chmod(dest, mode)
+        return True
+
+    def store(self, key, cwd, paths):
+        ''' add the files that the compile made (relative to cwd) '''
+        self.put(key, {'files': [[os.path.relpath(path, cwd or '.'), os.stat(path).st_mode & 0o777] for path in paths]},
+                **{f'file{index}': path for index, path in enumerate(paths)})
+
+
+class Manifest:
+    '''
+    The build manifest of "kg make --incremental" (in .kgcache/manifest.json). For each target file, it records a key
+    (see data_hash) of everything the file was made from, and the hash of the file itself. A target is up to date if
+    its key is the same and the file wasn't modified since.
+    '''
+    def __init__(self, loc):
+        self.loc = loc
+        self.path = os.path.join(loc, '.kgcache', 'manifest.json')
+        self._lock = threading.Lock()
+        try:
+            with open(self.path) as f:
+                self.targets = json.load(f)
+        except (OSError, ValueError):
+            self.targets = {}
+
+    def _name(self, target):
+        return os.path.relpath(target, self.loc)
+
+    def fresh(self, target, key):
+        ''' whether the target exists and was made from the same key '''
+        entry = self.targets.get(self._name(target))
+        return bool(entry) and entry['key'] == key and os.path.isfile(target) and file_hash(target) == entry['hash']
+
+    def record(self, target, key):
+        ''' record that the target (which must exist) was just made from the key '''
+        entry = {'key': key, 'hash': file_hash(target)}
+        with self._lock:
+            self.targets[self._name(target)] = entry
+
+    def forget(self, target):
+        with self._lock:
+            self.targets.pop(self._name(target), None)
+
+    def save(self):
+        touch_container(self.path)
+        with self._lock:
+            with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(self.path), prefix='kg_tmp_manifest_',
+                    delete=False) as f:
+                json.dump(self.targets, f, indent=4, sort_keys=True)
+            os.replace(f.name, self.path)
@@ -36,6 +36,34 @@ class Subtask(object):
     def serialize(self):
         raise NotImplementedError # not implemented yet. returns a dict to be json'ed
 
+verdicts = {'AC', 'WA', 'TLE', 'RE'}
+
+class ExpectedSolution(object):
+    """ A solution, and the verdict(s) it is expected to get on each subtask (used by "kg verify") """
+    def __init__(self, solution, relpath=None):
+        if not isinstance(solution, dict) or 'program' not in solution:
+            raise TypeError("Each solution must be an object with a 'program' key")
+        self.program = Program.from_data(solution['program'], relpath=relpath)
+
+        # a verdict (or a list of allowed verdicts) for all subtasks, or a dict subtask -> verdict(s),
+        # where the subtask '*' stands for all subtasks that are not listed
+        expected = solution.get('expected', 'AC')
+        if not isinstance(expected, dict):
+            expected = {'*': expected}
+        self.expected = {}
+        for sub, sub_verdicts in expected.items():
+            if isinstance(sub_verdicts, str): sub_verdicts = [sub_verdicts]
+            if not sub_verdicts or not set(sub_verdicts) <= verdicts:
+                raise ValueError(f"Invalid expected verdict(s) for {self.program.filename}: {sub_verdicts!r}; "
+                                 f"each must be in {sorted(verdicts)}")
+            self.expected[sub if sub == '*' else int(sub)] = frozenset(sub_verdicts)
+
+        super().__init__()
+
+    def expected_for(self, sub):
+        """ the set of verdicts allowed for the subtask, or None if there's no expectation """
+        return self.expected.get(sub, self.expected.get('*'))
+
 class Details(object):
     def __init__(self, details={}, source=None, relpath=None):
         self.details = details
@@ -61,6 +89,19 @@ class Details(object):
         for key in ['generators', 'other_programs']:
             setattr(self, key, [self._maybe_prog(x, key=key) for x in self.details.get(key, [])])
 
+        # what "kg test" does when the output is byte-for-byte identical to the judge file (opt-in):
+        # 'accept' it right away without running the checker, or 'flag' it to the checker via --identical
+        if self.checker and self.checker.attributes.get('identical') not in {None, 'accept', 'flag'}:
+            raise ValueError(f"The checker's 'identical' attribute must be 'accept' or 'flag', "
+                             f"got {self.checker.attributes['identical']!r}")
+
+        self.solutions = [ExpectedSolution(solution, relpath=relpath) for solution in self.details.get('solutions', [])]
+        for solution in self.solutions:
+            invalid = {sub for sub in solution.expected if sub != '*'} - set(self.valid_subtasks)
+            if invalid:
+                raise ValueError(f"Invalid subtasks found in the expected verdicts of {solution.program.filename}: " +
+                        ' '.join(map(str, sorted(invalid))))
+
         self.scoring = self._get_scoring(self.details.get('scoring'))
 
         if not self.subtask_detector:
@@ -149,6 +190,9 @@ class Details(object):
             diff_pref = '!diff.'
             if isinstance(v, str) and v.startswith(diff_pref): 
                 v = os.path.join(kg_path, 'diff', v[len(diff_pref):] + '.py')
+            # also with attributes, e.g., ["!diff.exact", {"identical": "accept"}]
+            if isinstance(v, list) and v and isinstance(v[0], str) and v[0].startswith(diff_pref):
+                v = [os.path.join(kg_path, 'diff', v[0][len(diff_pref):] + '.py'), *v[1:]]
         prog = Program.from_data(v, relpath=self.relpath) if v else None
         return prog
 
@@ -0,0 +1,166 @@
+from concurrent.futures import ProcessPoolExecutor
+from subprocess import CalledProcessError
+import contextlib
+import io
+import multiprocessing
+import os
+import os.path
+import random
+import runpy
+import sys
+import traceback
+
+from .programs import get_python3_command
+from .utils import *
+
+
+# worker side
+
+# the folders of the programs run so far
+_script_dirs = set()
+
+def _local_modules(folders):
+    ''' the imported modules whose files are in one of the folders (except kg's own) '''
+    folders = tuple(os.path.join(os.path.realpath(folder), '') for folder in folders)
+    kg_folder = os.path.join(kg_path, '')
+    for name, module in [*sys.modules.items()]:
+        file = getattr(module, '__file__', None)
+        if file:
+            file = os.path.realpath(file)
+            if file.startswith(folders) and not file.startswith(kg_folder): yield name
+
+def _prepare(path, args, cwd):
+    '''
+    set things up like "python3 path *args" would, i.e., in a fresh interpreter: the program can import files beside
+    it, those files are imported again (so none of their state is left over from the previous run), and random is
+    seeded anew
+    '''
+    if cwd: os.chdir(cwd)
+    script_dir = os.path.dirname(os.path.abspath(path))
+    if script_dir in sys.path: sys.path.remove(script_dir)
+    sys.path.insert(0, script_dir)
+    _script_dirs.add(script_dir)
+    for name in [*_local_modules(_script_dirs)]: del sys.modules[name]
+    random.seed()
+    sys.argv = [path, *args]
+
+def _exit_code(exc):
+    return exc.code if isinstance(exc.code, int) else 0 if exc.code is None else 1
+
+
+def _run_checker(path, args, cwd=None):
+    '''
+    the equivalent of running "python3 path *args"; returns the exit code and everything it printed. The checker file
+    itself is run again each time (so its checker and any global state are fresh); only kg.checkers, etc., stay
+    imported in the worker.
+    '''
+    from .. import checkers
+    out = io.StringIO()
+    check_files = checkers.check_files
+    def check_files_to_out(*args, **kwargs):
+        # the default log_file is the real stdout (bound when kg.checkers was imported)
+        kwargs.setdefault('log_file', out)
+        return check_files(*args, **kwargs)
+
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+        checkers.check_files = check_files_to_out
+        try:
+            _prepare(path, args, cwd)
+            runpy.run_path(path, run_name='__main__')
+            returncode = 0
+        except SystemExit as exc:
+            returncode = _exit_code(exc)
+        except BaseException:
+            traceback.print_exc()
+            returncode = 1
+        finally:
+            checkers.check_files = check_files
+    return returncode, out.getvalue()
+
+def _run_generator(path, args, cwd=None, stdout=None):
+    '''
+    the equivalent of running "python3 path *args > stdout"; returns the exit code. Only the generator file (and the
+    files beside it that it imports) are run again each time; the other modules it imports (kg.generators, etc.) stay
+    imported in the worker.
+    '''
+    # the generator gets its own stdout, since it may close it (e.g., kg.formatters does)
+    with open(stdout, 'w') if stdout is not None else open(os.dup(sys.stdout.fileno()), 'w') as out:
+        try:
+            _prepare(path, args, cwd)
+            with contextlib.redirect_stdout(out):
+                runpy.run_path(path, run_name='__main__')
+            returncode = 0
+        except SystemExit as exc:
+            returncode = _exit_code(exc)
+        except BaseException:
+            traceback.print_exc()
+            returncode = 1
+        finally:
+            sys.stderr.flush()
+    return returncode
+
+
+# parent side
+
+class _ProgramPool:
+    # the programs must mention this kg module, and call one of these functions
+    module = None
+    functions = []
+
+    def __init__(self, max_workers=None):
+        # 'spawn' so that the workers don't inherit the state (e.g., threads) of kg itself
+        self._executor = ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context('spawn'))
+        self._supported = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._executor.shutdown()
+
+    def supports(self, program):
+        ''' whether the program is a Python program that uses the module, run as usual (i.e., "python3 file") '''
+        if program not in self._supported:
+            supported = (program.filename.endswith('.py') and
+                    program.run == [get_python3_command(), program.filename] and
+                    os.path.isfile(program.rel_filename))
+            if supported:
+                with open(program.rel_filename) as f:
+                    source = f.read()
+                supported = self.module in source and any(f'{function}(' in source for function in self.functions)
+            self._supported[program] = supported
+        return self._supported[program]
+
+    def _submit(self, func, program, *args, **kwargs):
+        path = os.path.abspath(program.rel_filename)
+        cwd = os.path.abspath(program.relpath) if program.relpath else None
+        return self._executor.submit(func, path, [*args], cwd, **kwargs).result()
+
+
+class CheckerPool(_ProgramPool):
+    '''
+    Runs KompGen Python checkers (those that use kg.checkers) in a pool of worker processes. The workers keep kg
+    imported, so each check skips starting the interpreter and importing kg, but the checker itself (and the files
+    beside it that it imports) are run anew each time, just like in a new process.
+    '''
+    module = 'kg.checkers'
+    functions = ['check_files']
+
+    def run(self, program, *args):
+        ''' run the checker with the given command line arguments; returns the exit code and its output '''
+        return self._submit(_run_checker, program, *args)
+
+
+class GeneratorPool(_ProgramPool):
+    '''
+    Runs KompGen Python generators (those that use kg.generators) in a pool of worker processes. The workers keep kg
+    (and the other installed modules) imported, so each run skips starting the interpreter and importing kg, etc. The
+    files beside the generator that it imports (e.g., a formatter) are imported anew for each run.
+    '''
+    module = 'kg.generators'
+    functions = ['write_to_file', 'write_to_files']
+
+    def run(self, program, *args, stdout=None):
+        ''' like program.do_run(*args, stdout=...), except stdout is a filename (or None) '''
+        returncode = self._submit(_run_generator, program, *args, stdout=stdout)
+        if returncode: raise CalledProcessError(returncode, [*program.run, *args])
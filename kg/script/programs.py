@@ -4,16 +4,21 @@ from enum import Enum
 from functools import wraps, partial
 from itertools import chain
 from sys import stderr
-from threading import Thread
+from threading import Lock, Thread
 import json
 import os
 import os.path
+import shutil
+import signal
 import stat
 import subprocess
+import sys
 import tempfile
 import time as timel
 
+from .cache import CompileCache, data_hash, user_cache_dir
 from .utils import *
+from .zygote import ForkServer, ForkServerError
 
 class IMode(Enum):
     STDIO = 'stdio'
@@ -21,7 +26,8 @@ class IMode(Enum):
 
 class ProgramsError(Exception): ...
 
-ProgramResult = namedtuple('ProgramResult', ['result', 'running_time'])
+# cpu_time (user + sys) is in seconds and max_memory (max RSS) is in bytes. They're None if unavailable.
+ProgramResult = namedtuple('ProgramResult', ['result', 'running_time', 'cpu_time', 'max_memory'], defaults=[None, None])
 
 class InteractorException(ProgramsError):
     def __init__(self, original_error, *args, **kwargs):
@@ -65,30 +71,27 @@ def _get_python3_command(*, fallback='python3', lowest_version=8, highest_versio
     though 'kg' will just be an empty module.
     """
     if verbose: info_print("getting Python 3 command...", end='', file=stderr, flush=True)
+    commands = _python3_commands(fallback=fallback, lowest_version=lowest_version, highest_version=highest_version)
+    key = _python3_probe_key(commands)
+    command = _python3_probe_hit(_python3_probe_cache().get(key))
+    if command:
+        if verbose: print(info_text("got"), key_text(command), info_text("(cached)"), file=stderr)
+        return command
+
     previous = set()
-    def commands():
-        for v in range(highest_version, lowest_version-1, -1):
-            yield f'pypy3.{v}'
-        yield 'pypy3'
-        for v in range(highest_version, lowest_version-1, -1):
-            yield f'python3.{v}'
-        yield 'python3'
-        yield 'py3'
-        yield 'python'
-        yield 'py'
-        yield fallback
-    for command in commands():
+    for command in commands:
         try:
-            subprocess.run([command, '-c', 'from kg import main'],
+            kg_file = subprocess.run([command, '-c', 'from kg import main; import kg, os; print(os.path.abspath(kg.__file__))'],
                     stdout=subprocess.PIPE,
                     stderr=subprocess.PIPE,
-                    check=True)
+                    check=True).stdout.decode().strip()
         except Exception:
             previous.add(command)
         else:
             if verbose: print(info_text("got"), key_text(command),
                               info_text(f"('kg' not found in {', '.join(previous)})" if previous else ''),
                               file=stderr)
+            _save_python3_probe(key, command, kg_file)
             return command
     if verbose:
         print(
@@ -97,6 +100,83 @@ def _get_python3_command(*, fallback='python3', lowest_version=8, highest_versio
             file=stderr)
     return fallback
 
+def _python3_commands(*, fallback, lowest_version, highest_version):
+    return [
+        *(f'pypy3.{v}' for v in range(highest_version, lowest_version-1, -1)),
+        'pypy3',
+        *(f'python3.{v}' for v in range(highest_version, lowest_version-1, -1)),
+        'python3',
+        'py3',
+        'python',
+        'py',
+        fallback,
+    ]
+
+# The result of the probe is saved in the user's cache directory (see _save_python3_probe), since the probe runs every
+# command until one works, and that adds up to a second or so to every kg (and kg-aux) call.
+_python3_probes_file = 'python3.json'
+_python3_probes_max = 16
+
+def _python3_probe_key(commands):
+    '''
+    Everything the result of the probe depends on: PATH, the kg installation, and where each command is found (and
+    the size and modification time of that file). So it changes whenever a Python is installed, removed or updated.
+    '''
+    found = {}
+    for command in commands:
+        path = shutil.which(command)
+        if path:
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            found[command] = [path, info.st_mtime_ns, info.st_size]
+    try:
+        from importlib.metadata import version
+        kg_version = version('KompGen')
+    except Exception:
+        kg_version = None
+    kg_stamp = os.stat(os.path.join(kg_path, '__init__.py')).st_mtime_ns
+    return data_hash('python3', os.environ.get('PATH', ''), kg_path, kg_version, kg_stamp, found)
+
+def _python3_probe_hit(probe):
+    '''
+    The command of a saved probe, if the kg it found is still there. This is a cheap check (a single stat) that catches
+    kg being uninstalled (or reinstalled) for that command only, which the key doesn't see.
+    '''
+    if not isinstance(probe, dict): return None
+    try:
+        if os.stat(probe['kg_file']).st_mtime_ns != probe['kg_stamp']: return None
+    except (OSError, KeyError, TypeError):
+        return None
+    return probe.get('command')
+
+def _python3_probe_cache():
+    try:
+        with open(os.path.join(user_cache_dir(), _python3_probes_file)) as f:
+            probes = json.load(f)
+        return probes if isinstance(probes, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def _save_python3_probe(key, command, kg_file):
+    path = os.path.join(user_cache_dir(), _python3_probes_file)
+    # the most recent ones last; only a few are kept (e.g., one for each virtualenv)
+    probes = {k: v for k, v in _python3_probe_cache().items() if k != key}
+    probes = dict([*probes.items()][-(_python3_probes_max - 1):])
+    try:
+        probes[key] = {'command': command, 'kg_file': kg_file, 'kg_stamp': os.stat(kg_file).st_mtime_ns}
+    except OSError:
+        return
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(path), prefix='kg_tmp_python3_',
+                delete=False) as f:
+            json.dump(probes, f, indent=4)
+        os.replace(f.name, path)
+    except OSError:
+        pass
+
 python3_command = None
 def get_python3_command(*, verbose=True):
     global python3_command
@@ -104,8 +184,192 @@ def get_python3_command(*, verbose=True):
     return python3_command
 
 
+# the keys of the 'limits' argument of Program.do_run and Program.get_runner_process
+_rlimit_names = {
+    'cpu': 'RLIMIT_CPU',  # seconds
+    'memory': 'RLIMIT_AS',  # bytes
+    'data': 'RLIMIT_DATA',  # bytes
+    'file_size': 'RLIMIT_FSIZE',  # bytes
+    'processes': 'RLIMIT_NPROC',  # note: this counts all processes of the user, not just the program's
+}
+
+def _limiter(limits):
+    """Return a preexec_fn that puts the process in its own process group and applies the resource limits."""
+    try:
+        import resource
+    except ImportError as exc:
+        raise ProgramsError("Resource limits are not supported on this platform") from exc
+
+    # compute everything in the parent; the child should do as little as possible before exec
+    rlimits = []
+    for name, value in limits.items():
+        if value is None: continue
+        if name not in _rlimit_names: raise ProgramsError(f"Unknown resource limit: {name!r}")
+        res = getattr(resource, _rlimit_names[name])
+        soft = hard = int(-(-value // 1))
+        if name == 'cpu': hard += 1  # SIGXCPU first, then SIGKILL a second later
+        _, max_hard = resource.getrlimit(res)
+        if max_hard != resource.RLIM_INFINITY: soft, hard = min(soft, max_hard), min(hard, max_hard)
+        rlimits.append((res, (soft, hard)))
+
+    def preexec():
+        os.setpgrp()
+        for res, limit in rlimits: resource.setrlimit(res, limit)
+    return preexec
+
+
+class KillSwitch:
+    """Kills all running processes started with it (via the 'kill_switch' argument) once flipped.
+
+    Processes started with it after it's flipped are killed right away.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self._processes = set()
+        self.flipped = False
+
+    def _add(self, process):
+        with self._lock:
+            if not self.flipped:
+                self._processes.add(process)
+                return
+        process.kill()
+
+    def _discard(self, process):
+        with self._lock:
+            self._processes.discard(process)
+
+    def flip(self):
+        with self._lock:
+            self.flipped = True
+            processes, self._processes = self._processes, set()
+        for process in processes:
+            process.kill()
+
+
+class _Process(subprocess.Popen):
+    """A Popen that also records the resource usage of the process when it's reaped (via os.wait4, if available).
+
+    If 'own_group' is true, the process runs in its own process group, and kill() kills the whole group, i.e.,
+    including any subprocesses it created. (This is meant for programs that don't need the terminal, e.g., solutions
+    under test.) If 'limits' is given, the process also runs in its own process group, with those resource limits (see
+    _rlimit_names).
+
+    If 'kill_switch' is given, the process is killed when the KillSwitch is flipped.
+    """
+    rusage = None
+
+    def __init__(self, *args, limits=None, own_group=False, kill_switch=None, **kwargs):
+        self.own_group = limits is not None or own_group and hasattr(os, 'killpg')
+        if limits is not None:
+            if kwargs.get('preexec_fn') is not None: raise ProgramsError("Cannot pass both limits and preexec_fn")
+            kwargs['preexec_fn'] = _limiter(limits)
+        elif self.own_group:
+            kwargs['start_new_session'] = True
+        super().__init__(*args, **kwargs)
+        self.kill_switch = kill_switch
+        if self.kill_switch: self.kill_switch._add(self)
+
+    def __exit__(self, *exc_info):
+        try:
+            return super().__exit__(*exc_info)
+        finally:
+            if self.kill_switch: self.kill_switch._discard(self)
+
+    def kill(self):
+        if self.own_group:
+            try:
+                os.killpg(self.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass  # the whole group is gone
+            else:
+                return
+        super().kill()
+
+    if hasattr(os, 'wait4'):
+        # Popen has no public way to get the resource usage, and it reaps the process with os.waitpid, which discards
+        # it. So the two private methods through which it reaps the process use os.wait4 instead: _try_wait (for wait()
+        # and communicate()) and _internal_poll (for poll(), and for Popen's own cleanup).
+        def _wait4(self, pid, wait_flags):
+            pid, sts, rusage = os.wait4(pid, wait_flags)
+            if pid == self.pid: self.rusage = rusage
+            return pid, sts
+
+        def _try_wait(self, wait_flags):
+            # this mirrors subprocess.Popen._try_wait
+            try:
+                return self._wait4(self.pid, wait_flags)
+            except ChildProcessError:
+                return self.pid, 0
+
+        def _internal_poll(self, _deadstate=None, **kwargs):
+            return super()._internal_poll(_deadstate, _waitpid=self._wait4, **kwargs)
+
+    def usage(self):
+        """Return the cpu time (in seconds) and max memory (in bytes) of the process, or Nones if unavailable."""
+        if self.rusage is None: return None, None
+        return (self.rusage.ru_utime + self.rusage.ru_stime,
+                self.rusage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024))
+
+
+def _run_process(*popenargs, input=None, timeout=None, check=False, popen=_Process, **kwargs):
+    """Like subprocess.run, but also returns the process (for its resource usage)."""
+    if input is not None:
+        if kwargs.get('stdin') is not None: raise ValueError('stdin and input arguments may not both be used.')
+        kwargs['stdin'] = subprocess.PIPE
+    with popen(*popenargs, **kwargs) as process:
+        try:
+            stdout, stderr = process.communicate(input, timeout=timeout)
+        except subprocess.TimeoutExpired as exc:
+            process.kill()
+            exc.stdout, exc.stderr = process.communicate()
+            raise
+        except BaseException:
+            process.kill()
+            raise
+        retcode = process.poll()
+        if check and retcode:
+            raise subprocess.CalledProcessError(retcode, process.args, output=stdout, stderr=stderr)
+    return subprocess.CompletedProcess(process.args, retcode, stdout, stderr), process
+
+
+# see use_fork_server
+_fork_server = None
+
+@contextmanager
+def use_fork_server(*, modules=()):
+    """While active, Program.do_run runs Python 3 programs through a fork server (see zygote.py) when it can.
+
+    modules are extra modules (or .py files) for the server to import, e.g., the problem's helper files.
+    """
+    global _fork_server
+    if not ForkServer.supported():
+        warn_print("Warning: The fork server is not supported on this platform", file=stderr)
+        yield
+        return
+    try:
+        server = ForkServer(get_python3_command(), modules)
+    except (ForkServerError, OSError) as exc:
+        # it's only a speed-up, so the programs are run normally instead
+        warn_print(f"Warning: The fork server failed to start ({exc}); the programs will run without it", file=stderr)
+        yield
+        return
+    with server:
+        _fork_server = server
+        try:
+            yield server
+        finally:
+            _fork_server = None
+
+
+def _usage_text(cpu_time, max_memory):
+    if cpu_time is None: return ''
+    return f' (cpu time: {cpu_time:.2f} sec., max memory: {max_memory / 2**20:.1f} MiB)'
+
+
 def _fix_timeout(kwargs):
-    # be careful with timeout when the program creates subprocesses... the children processes are not killed,
+    # be careful with timeout when the program creates subprocesses... the children processes are not killed
+    # (unless 'own_group' or 'limits' is passed, which puts the program in its own process group),
     # so multiple slow (and potentially memory-consuming) programs could be running in the background!!
     kwargs.setdefault('timeout', float('inf'))
 
@@ -117,6 +381,8 @@ def _fix_timeout(kwargs):
     if kwargs['timeout'] >= float('inf'):
         del kwargs['timeout']
 
+_compile_cache = CompileCache()
+
 class Program:
     def __init__(self, filename, compile_, run, *, relpath=None, strip_prefixes=['___'], check_exists=True, **attributes):
         if not filename: raise ValueError("Filename cannot be empty")
@@ -144,10 +410,29 @@ class Program:
 
     def do_compile(self, *, force=False, **kwargs):
         if (force or not self.compiled) and self.compile:
-            info_print(f"Compiling {self.filename}", file=stderr)
             kwargs.setdefault('cwd', self.relpath)
             kwargs.setdefault('check', True)
-            self._run(True, subprocess.run, self.compile, **kwargs)
+            # only plain compiles are cached; 'force' still compiles, but updates the cache
+            key = None
+            if set(kwargs) <= {'cwd', 'check'} and kwargs['cwd'] == self.relpath:
+                try:
+                    key = _compile_cache.key(self)
+                    if key and not force and _compile_cache.restore(key, self.relpath):
+                        info_print(f"Compiling {self.filename} (cached)", file=stderr)
+                        self.compiled = True
+                        return self
+                except OSError:
+                    key = None
+
+            info_print(f"Compiling {self.filename}", file=stderr)
+            before = _compile_cache.outputs(self) if key else {}
+            result = self._run(True, subprocess.run, self.compile, **kwargs)
+            if key and result.returncode == 0:
+                made = [path for path, stamp in _compile_cache.outputs(self).items() if before.get(path) != stamp]
+                try:
+                    _compile_cache.store(key, self.relpath, made)
+                except OSError:
+                    pass
         self.compiled = True
         return self
 
@@ -155,28 +440,38 @@ class Program:
         if not self.compiled: raise ProgramsError("Compile the program first")
         command = [*self.run, *args]
         kwargs.setdefault('cwd', self.relpath)
-        return subprocess.Popen(command, **kwargs)
+        return _Process(command, **kwargs)
+
+    def _forkable(self, kwargs):
+        # a plain "python3 file.py ..." command, with nothing that only a real subprocess can do
+        return (self.run[0] == get_python3_command() and len(self.run) >= 2 and self.run[1].endswith('.py') and
+                set(kwargs) <= {'cwd', 'check', 'stdin', 'stdout', 'stderr', 'timeout'} and
+                kwargs.get('stdin') != subprocess.PIPE)
 
     def do_run(self, *args, time=False, label=None, log_exc=True, **kwargs):
         if not self.compiled: raise ProgramsError("Compile the program first")
         command = [*self.run, *args]
         kwargs.setdefault('cwd', self.relpath)
         kwargs.setdefault('check', True)
+        if _fork_server and self._forkable(kwargs):
+            kwargs['popen'] = _fork_server.popen
         _fix_timeout(kwargs)
         if 'timeout' in kwargs:
             info_print(f"  will force timeout after {kwargs['timeout']:.2f} sec.", file=stderr)
         if time:
             start_time = timel.time()
+        cpu_time = max_memory = None
         try:
-            res = self._run(log_exc, subprocess.run, command, **kwargs)
+            res, process = self._run(log_exc, _run_process, command, **kwargs)
+            cpu_time, max_memory = process.usage()
         finally:
             if time:
                 elapsed = timel.time() - start_time
-                info_print(f'{label or "":>18} elapsed time: {elapsed:.2f} sec.', file=stderr)
+                info_print(f'{label or "":>18} elapsed time: {elapsed:.2f} sec.{_usage_text(cpu_time, max_memory)}', file=stderr)
             else:
                 elapsed = None
 
-        return ProgramResult(result=res, running_time=elapsed)
+        return ProgramResult(result=res, running_time=elapsed, cpu_time=cpu_time, max_memory=max_memory)
 
     def _run(self, log_exc, func, *args, **kwargs):
         try:
@@ -195,16 +490,18 @@ class Program:
     def _do_run_process(self, process, *, time=False, label=None, check=False, log_exc=True, timeout=None):
         if time:
             start_time = timel.time()
+        cpu_time = max_memory = None
         with process as proc:  # just to be safe; maybe in the future, Popen.__enter__ might return something else
             try:
                 retcode = self._run(log_exc, proc.wait, timeout=timeout)
+                if isinstance(proc, _Process): cpu_time, max_memory = proc.usage()
             except Exception as exc:
                 proc.kill()
                 raise
             finally:
                 if time:
                     elapsed = timel.time() - start_time
-                    info_print(f'{label or "":>18} elapsed time: {elapsed:.2f} sec.', file=stderr)
+                    info_print(f'{label or "":>18} elapsed time: {elapsed:.2f} sec.{_usage_text(cpu_time, max_memory)}', file=stderr)
                 else:
                     elapsed = None
             retcode = proc.poll()
@@ -212,7 +509,8 @@ class Program:
             if check and retcode:
                 raise subprocess.CalledProcessError(retcode, proc.args, output=None, stderr=None)
 
-        return ProgramResult(result=subprocess.CompletedProcess(proc.args, None, None, retcode), running_time=elapsed)
+        return ProgramResult(result=subprocess.CompletedProcess(proc.args, None, None, retcode), running_time=elapsed,
+                cpu_time=cpu_time, max_memory=max_memory)
 
 
     def do_interact(self, interactor, *args, time=False, label=None, check=False, log_exc=True,
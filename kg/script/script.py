@@ -1,7 +1,7 @@
 from collections import defaultdict, OrderedDict, Counter
 from contextlib import ExitStack
 from datetime import datetime
-from functools import wraps
+from functools import partial, wraps
 from html.parser import HTMLParser
 from operator import attrgetter
 from random import randrange, shuffle
@@ -12,9 +12,13 @@ from sys import stdin, stdout, stderr
 from textwrap import dedent
 import argparse
 import contextlib
+import filecmp
 import os.path
+import math
 import re
+import statistics
 import tempfile
+import threading
 import yaml
 import zipfile
 
@@ -23,9 +27,11 @@ from jinja2 import Template
 from natsort import natsorted
 
 from ..black_magic import *
+from .cache import *
 from .contest_details import *
 from .details import *
 from .formats import *
+from .inprocess import *
 from .passwords import *
 from .programs import *
 from .seating import *
@@ -288,12 +294,12 @@ def kg_subtasks(format_, args):
 
     compute_subtasks(subtasks, detector, format=format_, include_subtask_groups=True, max_workers=args.max_workers)
 
-def _get_subtask_detector_from_args(args, *, purpose, details=None):
+def _get_subtask_detector_from_args(args, *, purpose, details=None, file_args=True):
     if details is None:
         details = Details.from_format_loc(args.format, args.details, relpath=args.loc)
 
-    # build detector
-    detector = Program.from_args(args.file, args.command)
+    # build detector (-f/-c is not the detector if file_args is False, e.g., in "kg test" where it's the solution)
+    detector = Program.from_args(args.file, args.command) if file_args else None
     if not detector: # try validator
         detector = detector_from_validator(Program.from_args(args.validator_file, args.validator_command))
     
@@ -542,7 +548,8 @@ def kg_gen(format_, args):
     generate_outputs(format_, judge_data_maker, model_solution=model_solution, interacts=interacts,
             judge=judge, interactor=details.interactor, node_count=details.node_count, max_workers=args.max_workers)
 
-def generate_outputs(format_, data_maker, *, model_solution=None, judge=None, interacts=False, interactor=None, node_count=None, max_workers=None):
+def generate_outputs(format_, data_maker, *, model_solution=None, judge=None, interacts=False, interactor=None, node_count=None,
+        checker_pool=None, manifest=None, dependencies=(), max_workers=None):
     if not data_maker: raise CommandError("Missing solution/data maker")
     data_maker.do_compile()
     if judge: judge.do_compile()
@@ -555,6 +562,14 @@ def generate_outputs(format_, data_maker, *, model_solution=None, judge=None, in
         def pref(print, *args, **kwargs):
             info_print(f"[{index}]".rjust(5), end=' ')
             print(*args, **kwargs)
+        if manifest:
+            # everything the output is made from (the programs are compiled by now)
+            key = data_hash('output', file_hash(input_), node_count,
+                    *(program and program_hash(program) for program in (data_maker, model_solution, judge, interactor)),
+                    *map(program_hash, dependencies))
+            if manifest.fresh(output_, key):
+                pref(print, key_text(output_), info_text('is up to date'))
+                return
         touch_container(output_)
         pref(print, info_text('GENERATING'), src_text(input_, '-->', output_))
         try:
@@ -608,11 +623,18 @@ def generate_outputs(format_, data_maker, *, model_solution=None, judge=None, in
                         yield tmp.name
             with model_output() as model_out:
                 try:
-                    judge.do_run(*map(os.path.abspath, (input_, model_out, output_)), check=True, label='CHECKER')
+                    jargs = [*map(os.path.abspath, (input_, model_out, output_))]
+                    if checker_pool and checker_pool.supports(judge):
+                        returncode, output = checker_pool.run(judge, *jargs)
+                        print(output, end='')
+                        if returncode: raise CalledProcessError(returncode, judge.run + jargs)
+                    else:
+                        judge.do_run(*jargs, check=True, label='CHECKER')
                 except CalledProcessError as cpe:
                     pref(err_print, f"The judge did not accept {output_}", file=stderr)
                     raise CommandError(f"The judge did not accept {output_}") from cpe
 
+        if manifest: manifest.record(output_, key)
         pref(print, info_text('GENERATED ', input_, '-->'), key_text(output_))
         if max_workers == 1: print()
 
@@ -686,6 +708,27 @@ test_p = subparsers.add_parser('test',
                 You may also pass a full checker command via -jc, similar to -c for the solution file.
 
 
+                You may pass several solution files to -f. They are all tested in the same run (sharing the
+                checker and the subtask detection), and a score matrix is printed at the end. For example,
+
+                $ [*[kg test -f sol.cpp other_sol.cpp slow_sol.py -w 8]*]
+
+
+                With --cache, the runs of the solution and the checker are stored in .kgcache/, keyed by the contents
+                of the programs, the files and the time limit. The next "kg test --cache" then only reruns what
+                changed, e.g., only the checker if you just edited it. (You may delete .kgcache/ any time.)
+
+
+                To set a time limit, you may run the solution several times on each file with --repeat (after some
+                untimed runs with --warmup). This reports the min, median and p95 of its CPU time on each file and
+                subtask, and flags the files whose times vary too much to be trusted. For example,
+
+                $ [*[kg test -f sol.cpp --repeat 10 --warmup 2]*]
+
+                The median run is the one compared against the time limit. Don't use more workers (-w) for this,
+                since the runs would then slow each other down.
+
+
                 If you wrote your problem using "kg init", then you may omit "-i", "-o", "-f" and "-jf"; they will
                 default to the KompGen format ("tests/*.in" and "tests/*.ans"), and other details will be parsed
                 from details.json, so for example, "[*[kg test]*]" without options would just work. (You can still pass
@@ -705,7 +748,8 @@ test_p.add_argument('-d', '--details', help=argparse.SUPPRESS)
 test_p.add_argument('-i', '--input', help='input file pattern')
 test_p.add_argument('-o', '--output', help='output file pattern')
 test_p.add_argument('-c', '--command', nargs='+', help='solution command')
-test_p.add_argument('-f', '--file', help='solution file')
+test_p.add_argument('-f', '--file', nargs='+', help='solution file(s); if there are several, they are all tested '
+                                                    'in the same run, and a score matrix is printed at the end')
 test_p.add_argument('-jc', '--judge-command', nargs='+', help='judge command')
 test_p.add_argument('-jf', '--judge-file', help='judge file')
 test_p.add_argument('-js', '--judge-strict-args', action='store_true',
@@ -718,18 +762,121 @@ test_p.add_argument('-ic', '--interactor-command', nargs='+', help='interactor c
 test_p.add_argument('-if', '--interactor-file', help='interactor file, if the problem is interactive')
 test_p.add_argument('-tl', '--time-limit', type=float, help="the problem's time limit (or -1 for no limit); "
                                                             "the code will be terminated if it exceeds 4x this time")
+test_p.add_argument('-ct', '--cpu-time', action='store_true', help="compare the time limit against the CPU time "
+                                                                 "(user + sys) of the solution instead of the "
+                                                                 "wall-clock time, if available")
+test_p.add_argument('-ml', '--memory-limit', type=float, help="the memory limit of the solution, in MiB (the kernel "
+                                                               "enforces this on its address space, so it's a bit "
+                                                               "stricter than a limit on the memory actually used)")
+test_p.add_argument('-cl', '--cpu-limit', type=float, help="the CPU time limit of the solution, in seconds (rounded up); "
+                                                           "the kernel kills the solution if it exceeds this")
+test_p.add_argument('-fl', '--file-size-limit', type=float, help="the maximum size of a file the solution may write, in MiB")
+test_p.add_argument('-pl', '--process-limit', type=int, help="the maximum number of processes, but note that the kernel "
+                                                             "counts all of the user's processes, not just the solution's")
+test_p.add_argument('-ff', '--fail-fast', action='store_true', help="stop everything (including the running "
+                                                                    "programs, and the other solutions if there are "
+                                                                    "several) on the first file that isn't correct")
+test_p.add_argument('-sf', '--skip-failed-subtasks', action='store_true', help="don't test the remaining files of a "
+                                                                              "subtask once a solution scores 0 on it "
+                                                                              "(requires !min per-subtask scoring)")
+test_p.add_argument('--cache', action='store_true', help="cache the runs of the solution and the checker in .kgcache/, "
+                                                       "keyed by the contents of the programs and files, so that "
+                                                       "unchanged runs are skipped the next time (not for interactive "
+                                                       "problems)")
+test_p.add_argument('-r', '--repeat', type=int, default=1, help="benchmark mode: run the solution this many times on "
+                                                              "each file, and report the min, median and p95 of its "
+                                                              "CPU time per file and per subtask")
+test_p.add_argument('--warmup', type=int, default=0, help="in benchmark mode, the number of untimed runs on each file "
+                                                         "before the timed ones")
+test_p.add_argument('--in-process-checker', action='store_true', help="run the checker in a pool of worker processes "
+                                                                     "that keep kg imported, instead of starting a new "
+                                                                     "interpreter for every file (only for Python "
+                                                                     "checkers that use kg.checkers, e.g., the !diff "
+                                                                     "ones)")
 test_p.add_argument('-n', '--node-count', type=int, help="The number of nodes that the solution will be run on. If this "
                                                          "is given, there must also be an interactor.")
+# the default is a single worker, for more accurate timing
+test_p.add_argument('-w', '--max-workers', type=int, default=1, help=
+        'number of workers to test the files with (default is 1). '
+        'With more workers, the log of each file is printed once it is done, in order. '
+        'Note that running solutions in parallel may make their running times less accurate.')
+
+# a file's running times are too noisy if the p95 is more than this much slower than the min (relatively and absolutely)
+_noisy_rel = 0.2
+_noisy_abs = 0.02
+
+def _timing_stats(times):
+    """ the min, median and p95 (nearest-rank) of some running times, and whether they vary too much to be trusted """
+    times = sorted(times)
+    min_, median, p95 = times[0], statistics.median(times), times[math.ceil(0.95 * len(times)) - 1]
+    noisy = p95 - min_ > max(_noisy_rel * min_, _noisy_abs)
+    return min_, median, p95, noisy
+
+def _verify_groups(inputs, subtasks_of=None, all_subtasks=None):
+    """ the groups (subtasks) of each input file in kg verify, and all the groups; without subtasks, there's one group '*' """
+    if subtasks_of is None:
+        return {input_: ['*'] for input_ in inputs}, ['*']
+    return {input_: [int(sub) for sub in subtasks_of[input_]] for input_ in inputs}, natsorted(int(sub) for sub in all_subtasks)
+
+def _verify_needed(expectation, groups, failures, stops_early):
+    """ the groups of a file whose verdict in kg verify is expected and not yet established (so the file must be run) """
+    return [group for group in groups if expectation.expected_for(group) is not None
+            and not (stops_early and group in failures)]
+
+def _verify_failed(failures, groups, index, verdict):
+    """ record a failing file in its groups; the verdict of a group is that of its first failing file """
+    for group in groups:
+        failures[group] = min(failures.get(group, (index, verdict)), (index, verdict))
+
+def _skip_file(kill_switch, failed, subtasks):
+    """ why kg test should skip a file of a solution ('stopped' or 'failed'), or None to test it
+
+    failed is the set of subtasks the solution already scored 0 on (None without --skip-failed-subtasks). The kill
+    switch (None without --fail-fast) is shared by all the solutions, so once any of them fails, all of them stop.
+    """
+    if kill_switch and kill_switch.flipped: return 'stopped'
+    if failed is not None and set(subtasks) <= failed: return 'failed'
+    return None
+
+def _record_file(kill_switch, failed, subtasks, verdict, score):
+    """ record the result of a file of a solution in kg test (see _skip_file), and flip the kill switch if it failed
+
+    Returns False if the result should be discarded instead, since it finished after the kill switch was flipped (so it
+    was probably killed by it).
+    """
+    if kill_switch and kill_switch.flipped: return False
+    if kill_switch and verdict != 'AC': kill_switch.flip()
+    if failed is not None and score == 0: failed |= set(subtasks)
+    return True
+
+def _solution_key(solution, input_, time_limit, limits):
+    """ the key of a run of the solution in the cache of kg test """
+    return data_hash('solution', program_hash(solution), file_hash(input_), time_limit, limits)
+
+def _checker_key(judge, dependencies, strict_args, identical, index, input_, output_, judge_file):
+    """ the key of a run of the checker in the cache of kg test; dependencies are the programs the checker may import """
+    return data_hash('checker', program_hash(judge), *map(program_hash, dependencies), strict_args, identical,
+            None if strict_args else index,  # the checker only gets the index (as tc_id) without strict args
+            *map(file_hash, (input_, output_, judge_file)))
 
-# I didn't put workers and Threads here for more accurate timing. TODO reconsider if 'num_cores - 1' threads is ok or something
 @set_handler(test_p)
 def kg_test(format_, args):
+    _kg_test(format_, args)
+
+def _kg_test(format_, args, *, verify=False):
     if not args.format: args.format = format_
     format_ = get_format(args, read='io')
     details = Details.from_format_loc(args.format, args.details, relpath=args.loc)
 
-    solution = Program.from_args(args.file, args.command) or details.model_solution
-    if not solution: raise CommandError("Missing solution")
+    if verify:
+        if not details.solutions: raise CommandError("No solutions with expected verdicts found in details.json")
+        solutions = [solution.program for solution in details.solutions]
+    else:
+        if args.command and args.file and len(args.file) > 1:
+            raise CommandError("Only one solution file can be given with a solution command")
+        solutions = [*filter(None, (Program.from_args(file, args.command) for file in args.file or [None]))]
+        if not solutions and details.model_solution: solutions = [details.model_solution]
+        if not solutions: raise CommandError("Missing solution")
 
     judge = Program.from_args(args.judge_file, args.judge_command) or details.checker
     if not judge: raise CommandError("Missing judge")
@@ -741,6 +888,14 @@ def kg_test(format_, args):
     if time_limit == -1: time_limit = float('inf')
     print(info_text('Using problem time limit:'), key_text(time_limit), info_text('sec.'))
 
+    # resource limits for the solution (which always runs in its own process group, killed as a whole on timeout)
+    limits = {}
+    if args.memory_limit is not None: limits['memory'] = int(args.memory_limit * 2**20)
+    if args.cpu_limit is not None: limits['cpu'] = args.cpu_limit
+    if args.file_size_limit is not None: limits['file_size'] = int(args.file_size_limit * 2**20)
+    if args.process_limit is not None: limits['processes'] = args.process_limit
+    limits = limits or None
+
     node_count = args.node_count
     if node_count is None: node_count = details.node_count
     if node_count is None:
@@ -750,15 +905,119 @@ def kg_test(format_, args):
         if not interactor: raise CommandError("There must be an interactor if node-count is given")
         interaction_mode = IMode.FIFO
 
+    if args.skip_failed_subtasks:
+        if not (format_.name and details.valid_subtasks):
+            raise CommandError("--skip-failed-subtasks requires the problem to have subtasks")
+        if details.scoring_per_subtask != '!min':
+            raise CommandError("--skip-failed-subtasks requires the per-subtask scoring to be !min")
+
+    if args.repeat < 1: raise CommandError("--repeat must be positive")
+    if args.warmup < 0: raise CommandError("--warmup can't be negative")
+    benchmarking = args.repeat > 1 or args.warmup > 0
+    if benchmarking:
+        if interactor: raise CommandError("--repeat and --warmup are not supported for interactive problems")
+        if args.max_workers != 1:
+            warn_print("Warning: The solutions run in parallel, so their running times in the benchmark are less accurate")
+    timings = {}  # (solution, index) -> the times of the timed runs, in benchmark mode
+
+    # see Details; this only applies to the checker from details.json (-jc/-jf programs have no attributes)
+    identical_mode = judge.attributes.get('identical')
+
+    # with --fail-fast, flipping this kills all the programs that are still running
+    kill_switch = KillSwitch() if args.fail_fast else None
+
+    cache = None
+    if args.cache:
+        if interactor:
+            warn_print("Warning: --cache is ignored for interactive problems")
+        else:
+            if benchmarking: warn_print("Warning: the runs of the solution aren't cached in benchmark mode")
+            cache = Cache(args.loc, 'test')
+
+    checker_pool = None
+    if args.in_process_checker:
+        checker_pool = CheckerPool(args.max_workers)
+        if not checker_pool.supports(judge):
+            warn_print(f"Warning: --in-process-checker is ignored since {judge.filename} doesn't use kg.checkers")
+
     interactor_strict_args = interactor and not interactor.filename.endswith('.py') # this is hacky for now...
     judge_strict_args = args.judge_strict_args
     # *_strict_args should probably be subsumed by arg formatting in details.json?
     # anyway, default behavior: use -C -t -v if ends in .py, else no extras
-    solution.do_compile()
+    for solution in solutions: solution.do_compile()
     judge.do_compile()
     if interactor: interactor.do_compile()
-    scoresheet = {}
-    for index, (input_, output_) in enumerate(format_.thru_io()):
+    def test_file(solution, index, input_, output_, *, capture=False):
+        def run_captured(run, *streams):
+            # if capturing, the programs' own output is collected too (instead of going straight to the terminal)
+            if not capture: return run()
+            with tempfile.TemporaryFile('w+', errors='replace') as out:
+                try:
+                    return run(**{stream: out for stream in streams})
+                finally:
+                    out.seek(0)
+                    cprint(out.read(), end='')
+
+        def run_solution(tmp):
+            """ run the solution against input_ (or replay its cached run), with its output going to tmp """
+            key = cache and not benchmarking and _solution_key(solution, input_, time_limit, limits)
+            meta = key and cache.get(key, output=tmp.name)
+            if meta:
+                info_print("  using the cached run of the solution")
+                if meta['outcome'] == 'TLE': raise TimeoutExpired(solution.run, meta['timeout'])
+                if meta['outcome'] == 'RE': raise CalledProcessError(meta['returncode'], solution.run)
+                return ProgramResult(result=None, running_time=meta['running_time'], cpu_time=meta['cpu_time'],
+                        max_memory=meta['max_memory'])
+
+            def run_once(label):
+                tmp.seek(0)
+                tmp.truncate()
+                with open(input_) as inp:
+                    return run_captured(partial(solution.do_run,
+                            stdin=inp,
+                            stdout=tmp,
+                            time=True,
+                            label=label,
+                            check=True,
+                            log_exc=False,
+                            time_limit=time_limit,
+                            limits=limits,
+                            own_group=True,
+                            kill_switch=kill_switch,
+                        ), 'stderr')
+
+            try:
+                for run in range(args.warmup): run_once('WARMUP')
+                runs = [run_once('SOLUTION') for run in range(args.repeat)]
+            except TimeoutExpired as exc:
+                if key: cache.put(key, {'outcome': 'TLE', 'timeout': exc.timeout}, output=tmp.name)
+                raise
+            except CalledProcessError as exc:
+                # don't cache a run that was cut short by --fail-fast
+                if key and not (kill_switch and kill_switch.flipped):
+                    cache.put(key, {'outcome': 'RE', 'returncode': exc.returncode}, output=tmp.name)
+                raise
+
+            if benchmarking:
+                # the CPU time if available, since it's less affected by whatever else is running
+                times = [sres.running_time if sres.cpu_time is None else sres.cpu_time for sres in runs]
+                timings[solution, index] = times
+                min_, median, p95, noisy = _timing_stats(times)
+                info_print(f"  {len(times)} timed run(s): min {min_:.3f}, median {median:.3f}, p95 {p95:.3f} sec.")
+                if noisy: warn_print("  Warning: The running times vary too much to be trusted")
+                # the median run is the one compared against the time limit (its output is the same anyway)
+                sres = runs[sorted(range(len(runs)), key=times.__getitem__)[(len(runs) - 1) // 2]]
+            else:
+                sres, = runs
+            if key:
+                cache.put(key, {
+                    'outcome': 'OK',
+                    'running_time': sres.running_time,
+                    'cpu_time': sres.cpu_time,
+                    'max_memory': sres.max_memory,
+                }, output=tmp.name)
+            return sres
+
         def get_score():
             nonlocal interactor_strict_args, judge_strict_args
             with ExitStack() as estack:
@@ -774,7 +1033,7 @@ def kg_test(format_, args):
                         iargs = [input_, tmp.name]
                         if not interactor_strict_args:
                             iargs += [dummy_tmp.name, result_tmp.name, '-C', solution.filename, '-t', str(index), '-v']
-                        solutions_res, interactor_res = solution.do_interact(
+                        solutions_res, interactor_res = run_captured(lambda **streams: solution.do_interact(
                                 interactor,
                                 time=True,
                                 label='SOLUTION_{id}',
@@ -784,55 +1043,78 @@ def kg_test(format_, args):
                                 pass_id=interaction_mode == IMode.FIFO,
                                 node_count=node_count,
                                 interactor_args=iargs,
-                                interactor_kwargs=dict(check=False),
+                                interactor_kwargs=dict(check=False, kill_switch=kill_switch, **streams),
                                 time_limit=time_limit,
-                            )
+                                limits=limits,
+                                own_group=True,
+                                kill_switch=kill_switch,
+                                **streams,
+                            ), 'stderr')
                     else:
                         assert node_count == 1
-                        with open(input_) as inp:
-                            solutions_res = [solution.do_run(
-                                    stdin=inp,
-                                    stdout=tmp,
-                                    time=True,
-                                    label='SOLUTION',
-                                    check=True,
-                                    log_exc=False,
-                                    time_limit=time_limit,
-                                )]
+                        solutions_res = [run_solution(tmp)]
                 except TimeoutExpired as exc:
                     err_print('The solution took too long, so it was force-terminated...')
                     err_print(exc)
+                    get_score.verdict = 'TLE'
                     return False, 0
                 except CalledProcessError as exc:
+                    get_score.verdict = 'RE'
                     err_print('The solution issued a runtime error...')
+                    if limits and exc.returncode < 0:
+                        err_print('(It was killed by a signal; it may have exceeded one of the resource limits.)')
                     err_print(exc)
                     return False, 0
                 finally:
                     get_score.running_time = None
                     if solutions_res:
-                        runtimes = [sres.running_time for sres in solutions_res if sres.running_time is not None]
+                        # the wall-clock time if the CPU time isn't available (e.g., without os.wait4)
+                        runtimes = [sres.running_time if sres.cpu_time is None or not args.cpu_time else sres.cpu_time
+                                for sres in solutions_res]
+                        runtimes = [runtime for runtime in runtimes if runtime is not None]
                         if runtimes: get_score.running_time = sum(runtimes), max(runtimes)
 
                 # Check if the interactor issues WA by itself. Don't invoke the judge
                 if interactor_res and getattr(interactor_res.result, 'returncode', 0):
                     err_print('The interactor did not accept the interaction...')
+                    get_score.verdict = 'WA'
                     return False, 0
 
-                def run_judge():
+                def run_judge(identical=False):
                     jargs = list(map(os.path.abspath, (input_, tmp.name, output_)))
                     if not judge_strict_args:
                         jargs += [result_tmp.name, '-C', solution.filename, '-t', str(index), '-v']
-                    return judge.do_run(*jargs, check=False).result.returncode
+                        if identical: jargs.append('--identical')
+                    key = cache and _checker_key(judge, details.other_programs, judge_strict_args, identical, index,
+                            input_, tmp.name, output_)
+                    meta = key and cache.get(key, result=result_tmp.name)
+                    if meta:
+                        info_print("Using the cached verdict of the checker")
+                        return meta['returncode']
+                    if checker_pool and checker_pool.supports(judge):
+                        returncode, output = checker_pool.run(judge, *jargs)
+                        cprint(output, end='')
+                    else:
+                        returncode = run_captured(partial(judge.do_run, *jargs, check=False, kill_switch=kill_switch),
+                                'stdout', 'stderr').result.returncode
+                    if key and not (kill_switch and kill_switch.flipped):
+                        cache.put(key, {'returncode': returncode}, result=result_tmp.name)
+                    return returncode
 
                 info_print("Checking the output...")
-                returncode = run_judge()
-                if returncode == 3 and not judge_strict_args: # try again but assume the judge is strict
-                    info_print(
-                        "The error above might just be because of testlib... "
-                        "trying to judge again (but strict mode this time)"
-                    )
-                    judge_strict_args = True
-                    returncode = run_judge()
+                identical = bool(identical_mode) and filecmp.cmp(tmp.name, output_, shallow=False)
+                if identical and identical_mode == 'accept':
+                    info_print("The output is identical to the judge file, so it's accepted without the checker")
+                    returncode = 0
+                else:
+                    returncode = run_judge(identical)
+                    if returncode == 3 and not judge_strict_args: # try again but assume the judge is strict
+                        info_print(
+                            "The error above might just be because of testlib... "
+                            "trying to judge again (but strict mode this time)"
+                        )
+                        judge_strict_args = True
+                        returncode = run_judge(identical)
                 correct = returncode == 0
 
                 try:
@@ -847,7 +1129,7 @@ def kg_test(format_, args):
                     rt_sum, rt_max = get_score.running_time
                     if node_count == 1: assert rt_sum == rt_max
                     # TODO we're using rt_max since we're using wall-clock time (even naively via time.time)
-                    # but we probably want to use sum of user times.
+                    # but we probably want to use sum of user times. (with --cpu-time, these are already user + sys times)
                     # https://cms.readthedocs.io/en/v1.4/Task%20types.html
                     if rt_max > time_limit:
                         err_print(f"The solution exceeded the time limit of {time_limit:.3f} sec;", end=' ')
@@ -856,16 +1138,22 @@ def kg_test(format_, args):
                         else:
                             err_print(f"the total running time is {rt_sum:.3f} sec (max {rt_max:.3f} sec)...")
                         if score > 0: info_print(f"It would have gotten a score of {score} otherwise...")
+                        get_score.verdict = 'TLE'
                         return False, 0
 
+                get_score.verdict = 'AC' if correct else 'WA'
                 return correct, score
 
         correct, score = get_score()
+        return correct, score, get_score.running_time, get_score.verdict
+
+    def report(scoresheet, index, input_, correct, score, running_time, verdict):
         scoresheet[index] = {
             'input': input_,
             'correct': correct,
             'score': score,
-            'running_time': get_score.running_time,
+            'running_time': running_time,
+            'verdict': verdict,
         }
         if correct:
             succ_print("File", str(index).rjust(3), 'correct')
@@ -874,6 +1162,63 @@ def kg_test(format_, args):
         if not 0 <= score <= 1:
             warn_print(f"Warning: The score '{score}' is invalid; it must be in the interval [0, 1].")
 
+    def announce(solution):
+        if len(solutions) > 1 or verify:
+            print()
+            beginfo_print('TESTING THE SOLUTION', solution.filename)
+
+    # the files are only globbed once, and shared by all solutions (as are the judge, interactor and subtasks)
+    files = [*format_.thru_io()]
+
+    def test_file_until_failure(solution, index, input_, output_, *, capture=False):
+        """ like test_file, but the file is skipped if --fail-fast or --skip-failed-subtasks says so """
+        failed = failed_subtasks[solution] if failed_subtasks is not None else None
+        subtasks = subtasks_of[input_] if subtasks_of is not None else None
+        with lock:
+            skip = _skip_file(kill_switch, failed, subtasks)
+            if skip == 'failed':
+                info_print("\nFile", str(index).rjust(3), 'skipped (the solution already scored 0 on its subtasks)')
+            if skip: return None
+        result = test_file(solution, index, input_, output_, capture=capture)
+        correct, score, running_time, verdict = result
+        with lock:
+            if not _record_file(kill_switch, failed, subtasks, verdict, score): return None
+            if kill_switch and kill_switch.flipped:
+                err_print(f"Stopping at the first failure (file {index} of {solution.filename})...")
+        return result
+
+    def test_all(test=test_file):
+        """ test every solution on every file, and return their scoresheets. 'test' may return None to skip a file """
+        scoresheets = [{} for solution in solutions]
+        if args.max_workers == 1:
+            for solution, scoresheet in zip(solutions, scoresheets):
+                announce(solution)
+                for index, (input_, output_) in enumerate(files):
+                    result = test(solution, index, input_, output_)
+                    if result is not None: report(scoresheet, index, input_, *result)
+        else:
+            # the logs of each file are collected, and printed in order
+            def test_file_captured(solution, index, input_, output_):
+                with capture_prints() as prints:
+                    return prints, test(solution, index, input_, output_, capture=True)
+
+            # all (solution, file) pairs go through the same pool
+            with thread_pool_executor(
+                        "Testing the solution" + ("s" if len(solutions) > 1 else ""),
+                        max_workers=args.max_workers,
+                        thread_name_prefix="kg_test",
+                    ) as executor:
+                futures = [[(index, input_, executor.submit(test_file_captured, solution, index, input_, output_))
+                        for index, (input_, output_) in enumerate(files)]
+                    for solution in solutions]
+                for solution, scoresheet, solution_futures in zip(solutions, scoresheets, futures):
+                    announce(solution)
+                    for index, input_, future in solution_futures:
+                        prints, result = future.result()
+                        print_captured(prints)
+                        if result is not None: report(scoresheet, index, input_, *result)
+        return scoresheets
+
     def abbreviate_indices(indices):
         if not indices: return 'none'
         return compress_t_sequence(','.join(map(str, sorted(indices))))
@@ -885,10 +1230,11 @@ def kg_test(format_, args):
             info_print(f"{len(indices):3} file(s) {description}")
 
 
-    def write_raw_summary():
+    def write_raw_summary(scoresheet):
         """ print the raw files gotten correct and wrong """
         corrects = [index for index, score_row in sorted(scoresheet.items()) if score_row['correct']]
         wrongs = [index for index, score_row in sorted(scoresheet.items()) if not score_row['correct']]
+        skipped = [index for index in range(len(files)) if index not in scoresheet]
         running_times = [*filter(None, (score_row['running_time'] for score_row in scoresheet.values()))]
         max_time = max(rt_max for rt_sum, rt_max in running_times) if running_times else None
         decor_print()
@@ -896,8 +1242,9 @@ def kg_test(format_, args):
         beginfo_print('SUMMARY:')
         print_file_list('gotten correct', corrects)
         print_file_list('gotten wrong  ', wrongs)
-        (succ_print if len(corrects) == len(scoresheet) else err_print)(len(corrects), end=' ')
-        (succ_print if len(corrects) == len(scoresheet) else info_print)(f'out of {len(scoresheet)} files correct')
+        if skipped: print_file_list('not tested    ', skipped)
+        (succ_print if len(corrects) == len(files) else err_print)(len(corrects), end=' ')
+        (succ_print if len(corrects) == len(files) else info_print)(f'out of {len(files)} files correct')
         if max_time is None:
             info_print('No running time was found from any run')
         else:
@@ -905,27 +1252,31 @@ def kg_test(format_, args):
         decor_print('.'*42)
 
     @memoize
-    def get_all_subtask_details():
+    def get_subtasks_of():
+        # this only depends on the files, so it's done once for all solutions
         print()
         info_print('Obtaining subtask info...')
         subtasks = args.subtasks or list(map(str, details.valid_subtasks))
         if os.path.isfile(details.subtasks_files):
-            inputs = [score_row['input'] for index, score_row in sorted(scoresheet.items())]
-            subtasks_of, all_subtasks = extract_subtasks(
+            inputs = [input_ for input_, output_ in files]
+            return extract_subtasks(
                 subtasks,
                 details.load_subtasks_files(),
                 inputs=inputs,
                 include_subtask_groups=False,
             )
         else:
-            detector = _get_subtask_detector_from_args(args, purpose='subtask scoring', details=details)
-            subtasks_of, all_subtasks = compute_subtasks(
+            detector = _get_subtask_detector_from_args(args, purpose='subtask scoring', details=details, file_args=False)
+            return compute_subtasks(
                 subtasks,
                 detector,
                 format=format_,
                 include_subtask_groups=False,
             )
 
+    def get_all_subtask_details(scoresheet):
+        subtasks_of, all_subtasks = get_subtasks_of()
+
         def get_max_score(sub):
             max_score = details.valid_subtasks[int(sub)].score if isinstance(details.valid_subtasks, dict) else 1
             if max_score is None: max_score = 1
@@ -943,10 +1294,15 @@ def kg_test(format_, args):
                 all_subtasks[sub]['indices'].append(index)
                 all_subtasks[sub]['scores'].append(score_row['score'])
                 all_subtasks[sub]['running_times'].append(score_row['running_time'])
+        untested = {sub for index, (input_, output_) in enumerate(files) if index not in scoresheet
+                        for sub in subtasks_of[input_]}
 
         # compute scores per subtask using the per-subtask scoring policy
         for sub, sub_details in all_subtasks.items():
-            if details.scoring_per_subtask == '!min':
+            # a subtask with files that weren't tested (e.g., with --fail-fast) gets 0
+            if sub in untested:
+                sub_details['score'] = 0
+            elif details.scoring_per_subtask == '!min':
                 sub_details['score'] = min(score for score in sub_details['scores'])
             elif details.scoring_per_subtask == '!ave':
                 sub_details['score'] = sum(sub_details['scores']) / len(sub_details['scores'])
@@ -968,67 +1324,250 @@ def kg_test(format_, args):
 
         raise ValueError(f"Unknown/Unsupported overall scoring policy: {details.scoring_overall}")
 
-    write_raw_summary()
+    def score_text(score, max_score):
+        return (
+            succ_text if score >= max_score else
+            info_text if score > 0 else
+            err_text
+        )(f"{score:8.3f}")
+
+    def write_summary(solution, scoresheet):
+        """ print the summary and subtask report of a solution, and return its subtask details and scores """
+        if len(solutions) > 1:
+            print()
+            beginfo_print('RESULTS OF THE SOLUTION', solution.filename)
+
+        write_raw_summary(scoresheet)
+
+        all_subtask_details = None
+        if format_.name and details.valid_subtasks:
+            # groups are subtasks
+            all_subtask_details = get_all_subtask_details(scoresheet)
+            group_scores = [(sub_details['weight'], sub_details['score'])
+                for sub, sub_details in natsorted(all_subtask_details.items())
+            ]
+        else:
+            # groups are individual files (files that weren't tested get 0)
+            group_scores = [(details.scoring_default_weight, scoresheet[index]['score'] if index in scoresheet else 0)
+                for index in range(len(files))
+            ]
+
+        scoring_result = get_score_for(group_scores)
+        max_scoring_result = get_score_for([(weight, 1) for weight, score in group_scores])
+
+        # print the subtask grades
+        if all_subtask_details is not None:
+            # print the raw summary again (because get_subtasks has huge output)
+            write_raw_summary(scoresheet)
+            beginfo_print('SUBTASK REPORT:')
+            for sub, sub_details in natsorted(all_subtask_details.items()):
+                score = sub_details['weighted_score']
+                weight = sub_details['weight']
+                max_running_time = sub_details['max_running_time']
+                times = []
+                print(
+                    info_text("Subtask ="),
+                    key_text(str(sub).rjust(4)),
+                    info_text(": Score = "),
+                    score_text(score, weight),
+                    info_text(f" out of {weight:8.3f}"),
+                    (
+                        info_text("  (no running time was found)")
+                        if max_running_time is None else
+                        info_text(f"  w/ max running time: {max_running_time:.2f}sec.")
+                    ), sep='')
+
+                if not 0 <= score <= weight:
+                    warn_print(f"Warning: The score {score} is invalid: "
+                               f"it must be in the interval [0, {weight}]")
+
+        if benchmarking: write_benchmark(solution, all_subtask_details)
+
+        # print the overall score
+        print()
+        print(info_text("Total Score =",
+              score_text(scoring_result, max_scoring_result),),
+              info_text(f" out of {max_scoring_result:8.3f}"),
+              sep='')
+        info_print(f'using the scoring policy {details.logical_scoring}')
 
-    if format_.name and details.valid_subtasks:
-        # groups are subtasks
-        group_scores = [(sub_details['weight'], sub_details['score'])
-            for sub, sub_details in natsorted(get_all_subtask_details().items())
-        ]
-    else:
-        # groups are individual files
-        group_scores = [(details.scoring_default_weight, score_row['score'])
-            for index, score_row in sorted(scoresheet.items())
-        ]
-
-    scoring_result = get_score_for(group_scores)
-    max_scoring_result = get_score_for([(weight, 1) for weight, score in group_scores])
-
-    # print the subtask grades
-    if format_.name and details.valid_subtasks:
-        # print the raw summary again (because get_subtasks has huge output)
-        write_raw_summary()
-        beginfo_print('SUBTASK REPORT:')
-        for sub, sub_details in natsorted(get_all_subtask_details().items()):
-            score = sub_details['weighted_score']
-            weight = sub_details['weight']
-            max_running_time = sub_details['max_running_time']
-            times = []
+        return all_subtask_details, scoring_result, max_scoring_result
+
+    def write_benchmark(solution, all_subtask_details):
+        """ print the timing statistics of the solution on each file, and on each subtask (i.e., on its slowest file) """
+        stats = {index: _timing_stats(times) for (sol, index), times in timings.items() if sol == solution}
+
+        def stats_text(min_, median, p95):
+            return info_text(f"min {min_:7.3f}  median {median:7.3f}  p95 {p95:7.3f}")
+
+        print()
+        beginfo_print('BENCHMARK (CPU time in sec., or wall-clock time if unavailable):')
+        for index, (min_, median, p95, noisy) in sorted(stats.items()):
+            print(info_text("File    ="), key_text(str(index).rjust(4)), info_text(": "), stats_text(min_, median, p95),
+                    warn_text("  (noisy)") if noisy else '', sep='')
+        if all_subtask_details is not None:
+            for sub, sub_details in natsorted(all_subtask_details.items()):
+                sub_stats = [stats[index] for index in sub_details['indices'] if index in stats]
+                if sub_stats:
+                    print(info_text("Subtask ="), key_text(str(sub).rjust(4)), info_text(": "),
+                            stats_text(*(max(column) for column in [*zip(*sub_stats)][:3])), sep='')
+                else:
+                    print(info_text("Subtask ="), key_text(str(sub).rjust(4)), info_text(": no timed runs"), sep='')
+        print_file_list("with running times that vary too much to be trusted",
+                [index for index, (min_, median, p95, noisy) in sorted(stats.items()) if noisy])
+
+    def write_score_matrix(results):
+        """ print a table of the scores of each solution (rows) on each subtask (columns) """
+        subs = natsorted(results[0][1] or {})
+        width = max(len(solution.filename) for solution, *rest in results)
+        print()
+        decor_print('.'*42)
+        beginfo_print('SCORE MATRIX:')
+        print(
+            info_text("Solution".ljust(width)),
+            *(key_text(str(sub).rjust(8)) for sub in subs),
+            key_text("Total".rjust(8)),
+            sep='  ')
+        for solution, all_subtask_details, scoring_result, max_scoring_result in results:
             print(
-                info_text("Subtask ="),
-                key_text(str(sub).rjust(4)),
-                info_text(": Score = "),
-                (
-                    succ_text if score >= weight else
-                    info_text if score > 0 else
-                    err_text
-                )(f"{score:8.3f}"),
-                info_text(f" out of {weight:8.3f}"),
-                (
-                    info_text("  (no running time was found)")
-                    if max_running_time is None else
-                    info_text(f"  w/ max running time: {max_running_time:.2f}sec.")
-                ), sep='')
-
-            if not 0 <= score <= weight:
-                warn_print(f"Warning: The score {score} is invalid: "
-                           f"it must be in the interval [0, {weight}]")
-
-    # print the overall score
-    print()
-    print(info_text("Total Score =",
-          (succ_text if scoring_result >= max_scoring_result else
-           info_text if scoring_result > 0 else
-           err_text)(f"{scoring_result:8.3f}"),),
-          info_text(f" out of {max_scoring_result:8.3f}"),
-          sep='')
-    info_print(f'using the scoring policy {details.logical_scoring}')
+                info_text(solution.filename.ljust(width)),
+                *(score_text(all_subtask_details[sub]['weighted_score'], all_subtask_details[sub]['weight'])
+                    for sub in subs),
+                score_text(scoring_result, max_scoring_result),
+                sep='  ')
+        decor_print('.'*42)
+
+    def verify_all():
+        """ test each solution only until its verdict on each subtask is established, and compare with the expected """
+        subtasked = bool(format_.name and details.valid_subtasks)
+        inputs = [input_ for input_, output_ in files]
+        groups_of, groups = _verify_groups(inputs, *(get_subtasks_of() if subtasked else ()))
+
+        # the first failing file of a !min group establishes its verdict, so the rest of the group can be skipped
+        stops_early = (details.scoring_per_subtask if subtasked else details.scoring_overall) == '!min'
+        expectations = dict(zip(solutions, details.solutions))
+        failures = {solution: {} for solution in solutions}  # group -> (index, verdict) of the first failing file
+        lock = threading.Lock()
+
+        def verify_file(solution, index, input_, output_, *, capture=False):
+            expectation = expectations[solution]
+            with lock:
+                needed = _verify_needed(expectation, groups_of[input_], failures[solution], stops_early)
+            if not needed:
+                info_print("\nFile", str(index).rjust(3), 'skipped (its verdict is already established)')
+                return None
+            result = test_file(solution, index, input_, output_, capture=capture)
+            correct, score, running_time, verdict = result
+            if verdict != 'AC':
+                with lock:
+                    _verify_failed(failures[solution], groups_of[input_], index, verdict)
+            return result
+
+        scoresheets = test_all(verify_file)
+
+        decor_print()
+        decor_print('.'*42)
+        beginfo_print('VERIFICATION REPORT:')
+        mismatched = []
+        for solution, scoresheet in zip(solutions, scoresheets):
+            info_print(solution.filename, f'({len(files) - len(scoresheet)} file(s) skipped)')
+            for group in groups:
+                expected = expectations[solution].expected_for(group)
+                if expected is None: continue
+                index, verdict = failures[solution].get(group, (None, 'AC'))
+                ok = verdict in expected
+                if not ok and solution not in mismatched: mismatched.append(solution)
+                print(
+                    info_text("    Subtask ="),
+                    key_text(str(group).rjust(4) if subtasked else ' all'),
+                    info_text(": Verdict = "),
+                    (succ_text if ok else err_text)(verdict.ljust(3)),
+                    info_text(f"  (expected {'/'.join(sorted(expected))})"),
+                    info_text(f"  on file {index}" if index is not None else ""),
+                    sep='')
+        decor_print('.'*42)
+
+        if mismatched:
+            raise CommandError(f"{len(mismatched)} solution(s) did not get the expected verdicts: " +
+                    ', '.join(solution.filename for solution in mismatched))
+        succ_print(f"All {len(solutions)} solution(s) got the expected verdicts")
+
+    with checker_pool or contextlib.nullcontext():
+        if verify:
+            verify_all()
+        else:
+            lock = threading.Lock()
+            subtasks_of = get_subtasks_of()[0] if args.skip_failed_subtasks else None
+            failed_subtasks = {solution: set() for solution in solutions} if args.skip_failed_subtasks else None
+            scoresheets = test_all(test_file_until_failure if args.fail_fast or args.skip_failed_subtasks else test_file)
+            results = [(solution, *write_summary(solution, scoresheet)) for solution, scoresheet in zip(solutions, scoresheets)]
+            if len(solutions) > 1: write_score_matrix(results)
 
     print()
     info_print("You can clear temp files by running 'kg-aux clear-temp-files'")
 
 
 
+##########################################
+# verify the expected verdicts of solutions
+
+verify_p = subparsers.add_parser('verify',
+    formatter_class=argparse.RawDescriptionHelpFormatter,
+               help='Check that solutions get their expected verdicts',
+        description=cformat_text(dedent('''\
+                Check that the solutions listed in details.json get their expected verdicts on each subtask.
+
+
+                $ [*[kg verify]*]
+
+                The solutions are listed under "solutions" in details.json, along with their expected verdicts
+                (AC, WA, TLE or RE). For example,
+
+                    "solutions": [
+                        {"program": "sol_slow.py", "expected": {"1": "AC", "*": "TLE"}},
+                        {"program": "sol_greedy.cpp", "expected": {"1": "AC", "2": ["WA", "RE"], "3": "WA"}},
+                        {"program": "sol_wrong.cpp", "expected": "WA"}
+                    ]
+
+                Here, "*" stands for all other subtasks, and a list means any of those verdicts is fine. A subtask
+                with no expected verdict is not tested at all. (If the problem has no subtasks, "expected" must be a
+                single verdict or list, for all files.)
+
+                The verdict of a solution on a subtask is AC if it is correct on all its files; otherwise, it is the
+                verdict on the first file it fails. Each solution is only run until its verdicts are established:
+                if the subtasks are scored with "!min" (the default), then once a solution fails a file, the
+                remaining files of that subtask are skipped, so "too slow" solutions only time out once per subtask.
+
+                The other options are the same as in "kg test". Note that with more workers (-w), files that were
+                already being tested when a verdict got established are not interrupted.
+        ''')))
+
+verify_p.add_argument('-l', '--loc', default='.', help='location to run commands on')
+verify_p.add_argument('-d', '--details', help=argparse.SUPPRESS)
+verify_p.add_argument('-s', '--subtasks', default=[], nargs='+', help='list of subtasks')
+verify_p.add_argument('-vc', '--validator-command', nargs='+', help='validator command, for subtask grading')
+verify_p.add_argument('-vf', '--validator-file', help='validator file, for subtask grading')
+verify_p.add_argument('-tl', '--time-limit', type=float, help="the problem's time limit (or -1 for no limit)")
+verify_p.add_argument('-ct', '--cpu-time', action='store_true', help="compare the time limit against the CPU time "
+                                                                   "of the solutions instead of the wall-clock time")
+verify_p.add_argument('-ml', '--memory-limit', type=float, help="the memory limit of the solutions, in MiB")
+verify_p.add_argument('-cl', '--cpu-limit', type=float, help="the CPU time limit of the solutions, in seconds")
+verify_p.add_argument('-fl', '--file-size-limit', type=float, help="the maximum size of a file the solutions may "
+                                                                   "write, in MiB")
+verify_p.add_argument('-pl', '--process-limit', type=int, help="the maximum number of processes (of the user)")
+verify_p.add_argument('-w', '--max-workers', type=int, default=1, help='number of workers to test the files with')
+# everything else is taken from details.json
+verify_p.set_defaults(format=None, input=None, output=None, file=None, command=None,
+        judge_file=None, judge_command=None, judge_strict_args=False,
+        interactor_file=None, interactor_command=None, node_count=None, fail_fast=False, skip_failed_subtasks=False,
+        cache=False, in_process_checker=False, repeat=1, warmup=0)
+
+@set_handler(verify_p)
+def kg_verify(format_, args):
+    _kg_test(format_, args, verify=True)
+
+
+
 ##########################################
 # just run the solution
 
@@ -1089,6 +1628,7 @@ run_p.add_argument('-i', '--input', help='input file pattern')
 run_p.add_argument('-o', '--output', help='output file pattern')
 run_p.add_argument('-c', '--command', nargs='+', help='solution command')
 run_p.add_argument('-f', '--file', help='solution file')
+run_p.add_argument('-ff', '--fail-fast', action='store_true', help='stop at the first input the program fails on')
 
 @set_handler(run_p, stderr)
 def kg_run(format_, args):
@@ -1107,6 +1647,9 @@ def kg_run(format_, args):
                 solution.do_run(stdin=inp, time=True, label='PROGRAM', check=True)
             except CalledProcessError:
                 err_print('The program issued a runtime error...', file=stderr)
+                if args.fail_fast:
+                    err_print('Stopping at the first failure...', file=stderr)
+                    break
 
 
 
@@ -1151,6 +1694,16 @@ make_p = subparsers.add_parser('make',
                 Other combinations are also allowed.
 
 
+                With --incremental, only the files that are out of date are remade. For example, after editing a
+                single testscript line, only its input files (and their output files) are generated again:
+
+                $ [*[kg make all --incremental]*]
+
+                This works through a manifest in .kgcache/manifest.json, which records what each file was made from
+                (the generator and its arguments, the programs, the "other_programs" that they may import, the input
+                file, etc.) (You may delete it any time; everything will just be remade the next time.)
+
+
                 You will probably want to run "kg make all" after finalizing all files---generators, validator,
                 checker, etc.---and make sure it finishes without errors. (unless this takes too long...)
         ''')))
@@ -1160,6 +1713,25 @@ make_p.add_argument('-l', '--loc', default='.', help='location to run commands o
 make_p.add_argument('-d', '--details', help=argparse.SUPPRESS)
 make_p.add_argument('-V', '--validation', action='store_true', help="Validate the input files against the validators")
 make_p.add_argument('-C', '--checks', action='store_true', help="Check the output file against the checker")
+make_p.add_argument('--in-process-checker', action='store_true', help="with the checks, run the checker in a pool of "
+                                                                     "worker processes that keep kg imported, instead "
+                                                                     "of starting a new interpreter for every file "
+                                                                     "(only for Python checkers that use kg.checkers)")
+make_p.add_argument('--in-process-generators', action='store_true', help="run the Python generators that use "
+                                                                        "kg.generators in a pool of worker processes "
+                                                                        "that keep kg imported, instead of starting a "
+                                                                        "new interpreter for every testscript line")
+make_p.add_argument('--fork-server', action='store_true', help="run the Python programs (validators, checkers, etc.) "
+                                                               "through a fork server that has kg already imported, "
+                                                               "instead of starting a new interpreter each time (not "
+                                                               "on Windows)")
+make_p.add_argument('--preload', nargs='+', default=[], metavar='FILE', help="with --fork-server, Python helper files "
+                                                                           "(e.g., formatter.py) for the server to "
+                                                                           "import too; they shouldn't do anything but "
+                                                                           "define things when imported")
+make_p.add_argument('--incremental', action='store_true', help="only remake the files whose generator, arguments, "
+                                                              "programs or inputs changed since the last "
+                                                              "'kg make --incremental' (see .kgcache/manifest.json)")
 make_p.add_argument('-w', '--max-workers', type=int, help=
         'number of workers to perform the task '
         "(default is based on Python's default behavior according to "
@@ -1172,9 +1744,34 @@ def _kg_make(format_, args):
         raise CommandError(f"You can't use '{format_}' format to 'make'.")
 
     details = Details.from_format_loc(format_, args.details, relpath=args.loc)
-    kg_make(args.makes, args.loc, format_, details, validation=args.validation, checks=args.checks, max_workers=args.max_workers)
+    if args.preload and not args.fork_server: raise CommandError("--preload requires --fork-server")
+    helpers = [attach_relpath(args.loc, filename) for filename in args.preload]
+    with use_fork_server(modules=helpers) if args.fork_server else contextlib.nullcontext():
+        kg_make(args.makes, args.loc, format_, details, validation=args.validation, checks=args.checks,
+                in_process_checker=args.in_process_checker, in_process_generators=args.in_process_generators,
+                incremental=args.incremental, max_workers=args.max_workers)
+
+def remove_stale(fmt_files, files, manifest):
+    """ remove the files that were made before but aren't anymore (they are the files that are cleared otherwise) """
+    for file in natsorted(set(fmt_files) - set(files)):
+        info_print(f"Removing {file} (it isn't made anymore)")
+        os.remove(file)
+        manifest.forget(file)
+
+def match_outputs(format_, loc, manifest):
+    """
+    make the output files match the input files without clearing them: remove the outputs whose inputs are gone, and
+    create the missing ones (empty, so they're not up to date, and they get made)
+    """
+    fmt = get_format_from_type(format_, loc, read='i')
+    outputs = {fmt.infer_i_to_o(input_) for input_ in fmt.inputs}
+    remove_stale(fmt.outputs, outputs, manifest)
+    for output_ in outputs - fmt.outputs:
+        touch_container(output_)
+        open(output_, 'w').close()
 
-def kg_make(omakes, loc, format_, details, *, validation=False, checks=False, max_workers=None):
+def kg_make(omakes, loc, format_, details, *, validation=False, checks=False, in_process_checker=False,
+        in_process_generators=False, incremental=False, max_workers=None):
     makes = set(omakes)
     valid_makes = {'all', 'inputs', 'outputs', 'subtasks'}
     if not (makes <= valid_makes):
@@ -1184,6 +1781,10 @@ def kg_make(omakes, loc, format_, details, *, validation=False, checks=False, ma
         makes |= valid_makes
         validation = checks = True
 
+    # when incremental, the files aren't cleared, and only the targets that aren't up to date are remade
+    manifest = Manifest(loc) if incremental else None
+    clear = lambda c: '' if incremental else c
+
     if 'inputs' in makes:
         decor_print()
         decor_print('~~ '*14)
@@ -1194,15 +1795,23 @@ def kg_make(omakes, loc, format_, details, *, validation=False, checks=False, ma
         with open(details.testscript) as scrf:
             script = scrf.read()
 
-        fmt = get_format_from_type(format_, loc, write='i', clear='i')
+        fmt = get_format_from_type(format_, loc, write='i', clear=clear('i'))
 
-        filenames = [*run_testscript(
-                fmt.thru_expected_inputs(),
-                script,
-                details.generators,
-                relpath=loc,
-                validator=details.validator if validation else None,
-                max_workers=max_workers)]
+        try:
+            with (GeneratorPool(max_workers) if in_process_generators else contextlib.nullcontext()) as generator_pool:
+                filenames = [*run_testscript(
+                        fmt.thru_expected_inputs(),
+                        script,
+                        details.generators,
+                        relpath=loc,
+                        validator=details.validator if validation else None,
+                        manifest=manifest,
+                        dependencies=details.other_programs,
+                        generator_pool=generator_pool,
+                        max_workers=max_workers)]
+        finally:
+            if manifest: manifest.save()
+        if manifest: remove_stale(fmt.inputs, filenames, manifest)
 
         succ_print('DONE MAKING INPUTS.')
 
@@ -1210,16 +1819,24 @@ def kg_make(omakes, loc, format_, details, *, validation=False, checks=False, ma
         decor_print()
         decor_print('~~ '*14)
         beginfo_print('MAKING OUTPUTS...' + ("WITH CHECKS..." if checks else 'WITHOUT CHECKS'))
-        fmt = get_format_from_type(format_, loc, read='i', write='o', clear='o')
+        if manifest: match_outputs(format_, loc, manifest)
+        fmt = get_format_from_type(format_, loc, read='i', write='o', clear=clear('o'))
         interacts = details.judge_data_maker.attributes.get('interacts') or details.interactor and details.model_solution == details.judge_data_maker
-        generate_outputs(
-                fmt, details.judge_data_maker,
-                model_solution=details.model_solution,
-                judge=details.checker if checks else None,
-                interacts=interacts,
-                node_count=details.node_count,
-                interactor=details.interactor,
-                max_workers=max_workers)
+        try:
+            with (CheckerPool(max_workers) if checks and in_process_checker else contextlib.nullcontext()) as checker_pool:
+                generate_outputs(
+                        fmt, details.judge_data_maker,
+                        model_solution=details.model_solution,
+                        judge=details.checker if checks else None,
+                        interacts=interacts,
+                        node_count=details.node_count,
+                        interactor=details.interactor,
+                        checker_pool=checker_pool,
+                        manifest=manifest,
+                        dependencies=details.other_programs,
+                        max_workers=max_workers)
+        finally:
+            if manifest: manifest.save()
 
         succ_print('DONE MAKING OUTPUTS.')
 
@@ -1245,16 +1862,29 @@ def kg_make(omakes, loc, format_, details, *, validation=False, checks=False, ma
             if details.validator and not subtasks: # subtask list required for detectors from validator
                 raise CommandError("Missing subtask list")
 
-            # iterate through inputs, run our detector against them
-            subtasks_of, all_subtasks = compute_subtasks(
-                    subtasks, detector,
-                    format=get_format_from_type(format_, loc, read='i'),
-                    relpath=loc,
-                    include_subtask_groups=True,
-                    max_workers=max_workers)
+            fmt = get_format_from_type(format_, loc, read='i')
+            key = None
+            if manifest:
+                detector.do_compile()
+                key = data_hash('subtasks', subtasks, program_hash(detector), *map(program_hash, details.other_programs),
+                        *map(file_hash, fmt.thru_inputs()))
 
-            info_print(f'WRITING TO {details.subtasks_files}')
-            details.dump_subtasks_files(construct_subs_files(subtasks_of))
+            if manifest and manifest.fresh(details.subtasks_files, key):
+                info_print(f'{details.subtasks_files} is up to date')
+            else:
+                # iterate through inputs, run our detector against them
+                subtasks_of, all_subtasks = compute_subtasks(
+                        subtasks, detector,
+                        format=fmt,
+                        relpath=loc,
+                        include_subtask_groups=True,
+                        max_workers=max_workers)
+
+                info_print(f'WRITING TO {details.subtasks_files}')
+                details.dump_subtasks_files(construct_subs_files(subtasks_of))
+                if manifest:
+                    manifest.record(details.subtasks_files, key)
+                    manifest.save()
 
             succ_print('DONE MAKING SUBTASKS.')
 
@@ -6,6 +6,7 @@ import json
 import os.path
 import re
 
+from .cache import *
 from .formats import *
 from .programs import *
 from .utils import *
@@ -37,7 +38,8 @@ TestScriptGenData = namedtuple('TestScriptGenData', ['src_line', 'gen', 'args',
 TestScriptGen = namedtuple('TestScriptGen', ['src_line', 'gen', 'args', 'single', 'target_indices', 'target', 'dollar_loc', 'rem_args', 'rep_args'])
 TestScript = namedtuple('TestScript', ['src', 'file_count', 'gens', 'start'])
 
-def run_testscript(inputs, testscript_src, generators, *, relpath=None, validator=None, max_workers=None):
+def run_testscript(inputs, testscript_src, generators, *, relpath=None, validator=None, manifest=None, dependencies=(),
+        generator_pool=None, max_workers=None):
     info_print("PARSING TESTSCRIPT")
     ts = compile_testscript(testscript_src, generators, relpath=relpath, max_workers=max_workers)
 
@@ -81,8 +83,11 @@ def run_testscript(inputs, testscript_src, generators, *, relpath=None, validato
             [index] = gen.target_indices
             filename = file_for[index]
             touch_container(filename)
-            with open(filename, 'w') as file:
-                gen.gen.do_run(*gen.args, label='GENERATOR', stdout=file)
+            if generator_pool and generator_pool.supports(gen.gen):
+                generator_pool.run(gen.gen, *gen.args, stdout=os.path.abspath(filename))
+            else:
+                with open(filename, 'w') as file:
+                    gen.gen.do_run(*gen.args, label='GENERATOR', stdout=file)
             pref(print, key_text(filename), info_text(f'generated  [line {gen.src_line!r}]'))
             yield filename, index
         else:
@@ -101,7 +106,10 @@ def run_testscript(inputs, testscript_src, generators, *, relpath=None, validato
                         raise TestScriptError(f"Temp file {sfile} exists and is not a file! Please clear {temp_folder}")
                     os.remove(sfile)
 
-            gen.gen.do_run(*gen.rep_args(starget), label='GENERATOR')
+            if generator_pool and generator_pool.supports(gen.gen):
+                generator_pool.run(gen.gen, *gen.rep_args(starget))
+            else:
+                gen.gen.do_run(*gen.rep_args(starget), label='GENERATOR')
             assert len(sfilenames) == len(gen.target_indices)
             for sfile, t in zip(sfilenames, gen.target_indices):
                 tfile = file_for[t]
@@ -124,7 +132,7 @@ def run_testscript(inputs, testscript_src, generators, *, relpath=None, validato
         if validator:
             executor.submit(validator.do_compile)
 
-    def validate(filename, index):
+    def validate(filename, index, key=None):
         def pref(print, *args, **kwargs):
             info_print(pref_v(index).rjust(mxl), end=' ')
             print(*args, **kwargs)
@@ -134,10 +142,27 @@ def run_testscript(inputs, testscript_src, generators, *, relpath=None, validato
                 validator.do_run(stdin=file, check=True, label='VALIDATOR')
             pref(info_print, f'{filename!r} validated')
             if max_workers == 1: print()
+        if manifest: manifest.record(filename, key)
         return filename
 
+    def up_to_date(filename):
+        future = concurrent.futures.Future()
+        future.set_result(filename)
+        return future
+
     def run_and_start_validation(gen):
-        return [executor.submit(validate, file, index) for file, index in run_testscript_line(gen)]
+        key = None
+        if manifest:
+            # everything the files of this line are made from (the programs are compiled by now), including the
+            # other files that the generator may import
+            key = data_hash('input', program_hash(gen.gen), gen.args, validator and program_hash(validator),
+                    *map(program_hash, dependencies))
+            filenames = [file_for[index] for index in gen.target_indices]
+            if all(manifest.fresh(filename, key) for filename in filenames):
+                info_print(pref_r(gen).rjust(mxl), end=' ')
+                print(src_text(repr(gen.src_line)), info_text('is up to date'))
+                return [up_to_date(filename) for filename in filenames]
+        return [executor.submit(validate, file, index, key) for file, index in run_testscript_line(gen)]
 
     with thread_pool_executor(
                 "Running testscript",
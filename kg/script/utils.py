@@ -1,11 +1,14 @@
 from sys import stdout, stderr
 import calendar
 import concurrent.futures
+import contextlib
 import os
 import os.path
 import pathlib
 import shutil
 import stat
+import sys
+import threading
 
 from jinja2 import Environment, select_autoescape, FileSystemLoader
 
@@ -138,7 +141,28 @@ def rand_cformat_text(x):
 
 # because termcolor.cprint sucks, I make my own...
 def cprint(*args, sep=' ', end='\n', color=None, on_color=None, attrs=None, **kwargs):
-    print(ctext(*args, sep=sep, end=end, color=color, on_color=on_color, attrs=attrs), end='', **kwargs)
+    text = ctext(*args, sep=sep, end=end, color=color, on_color=on_color, attrs=attrs)
+    captured = getattr(_capture, 'prints', None)
+    if captured is not None:
+        captured.append((kwargs.get('file') or sys.stdout, text))
+    else:
+        print(text, end='', **kwargs)
+
+_capture = threading.local()
+
+@contextlib.contextmanager
+def capture_prints():
+    ''' collects everything cprint'ed by the current thread (instead of printing it), so it can be printed later '''
+    old_prints = getattr(_capture, 'prints', None)
+    _capture.prints = prints = []
+    try:
+        yield prints
+    finally:
+        _capture.prints = old_prints
+
+def print_captured(prints):
+    for file, text in prints:
+        print(text, end='', file=file)
 
 _ultra_krazy = False
 def ctext(*args, sep=' ', end='', color=None, on_color=None, attrs=None):
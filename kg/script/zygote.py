@@ -0,0 +1,398 @@
+"""A fork server ("zygote") for Python programs.
+
+The server is a long-lived Python process that imports kg (and possibly some other modules) once. For each program to
+run, it forks a child that runs the program file as __main__ with the given arguments, file descriptors (for stdin,
+stdout and stderr) and working directory. This is like running "python3 file args...", except that the interpreter is
+already started and kg is already imported.
+
+The server is started with "python3 -m kg.script.zygote [socket] [modules...]", and exits once its stdin is closed.
+"""
+
+from subprocess import DEVNULL, PIPE, STDOUT, TimeoutExpired
+from threading import Thread
+import array
+import atexit
+import builtins
+import importlib
+import json
+import os
+import os.path
+import selectors
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+# the modules the server always imports
+_preload = [
+    'kg.checkers',
+    'kg.formatters',
+    'kg.generators',
+    'kg.interactors',
+    'kg.validators',
+    'kg.math.primes',
+    'kg.graphs.generators',
+    'kg.grids.generators',
+]
+
+_FD_COUNT = 3  # stdin, stdout, stderr
+_MAX_MESSAGE = 1 << 16
+
+class ForkServerError(Exception): ...
+
+def _returncode(status):
+    return -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+
+
+# server side
+
+def _recv_request(conn):
+    data, ancdata, flags, addr = conn.recvmsg(_MAX_MESSAGE, socket.CMSG_SPACE(_FD_COUNT * array.array('i').itemsize))
+    fds = array.array('i')
+    for level, type_, cdata in ancdata:
+        if level == socket.SOL_SOCKET and type_ == socket.SCM_RIGHTS:
+            fds.frombytes(cdata[:len(cdata) - len(cdata) % fds.itemsize])
+    while not data.endswith(b'\n'):
+        chunk = conn.recv(_MAX_MESSAGE)
+        if not chunk: raise ForkServerError("Incomplete request")
+        data += chunk
+    return json.loads(data), [*fds]
+
+def _run_child(request, fds):
+    ''' (in the forked child) run the program like "python3 file args..." would; never returns '''
+    code = 1
+    try:
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+        for fd in set(fds) - {0, 1, 2}:
+            os.close(fd)
+        os.chdir(request['cwd'])
+
+        # the server's standard streams now write to (and read from) the program's file descriptors. they must be
+        # kept, not replaced, since the preloaded modules may have captured them already (e.g., as default arguments)
+        sys.stdin, sys.stdout, sys.stderr = sys.__stdin__, sys.__stdout__, sys.__stderr__
+        if not sys.stdout.write_through: sys.stdout.reconfigure(line_buffering=os.isatty(1))
+
+        path = request['argv'][0]
+        sys.argv = request['argv']
+        sys.path[0] = os.path.dirname(os.path.abspath(path))
+        # otherwise, every child would get the same "random" numbers
+        if 'random' in sys.modules: sys.modules['random'].seed()
+        # the server's own exit functions aren't the program's
+        atexit._clear()
+
+        import runpy
+        try:
+            runpy.run_path(path, run_name='__main__')
+            code = 0
+        except SystemExit as exc:
+            if exc.code is None:
+                code = 0
+            elif isinstance(exc.code, int):
+                code = exc.code
+            else:
+                print(exc.code, file=sys.stderr)
+                code = 1
+        except BaseException as exc:
+            # like python3's, the traceback starts at the program, not here
+            tb = exc.__traceback__
+            while tb and tb.tb_frame.f_code.co_filename != path: tb = tb.tb_next
+            traceback.print_exception(type(exc), exc, tb)
+        # like at the interpreter's exit: wait for the non-daemon threads, run the exit functions, and flush the
+        # standard streams (unless the program closed them)
+        try:
+            threading._shutdown()
+        except BaseException:
+            traceback.print_exc()
+        atexit._run_exitfuncs()
+        # the program may have replaced sys.stdout and sys.stderr, but anything written to the originals counts too
+        for stream in [sys.stdout, sys.stderr, sys.__stdout__, sys.__stderr__]:
+            try:
+                if not stream.closed: stream.flush()
+            except Exception:
+                traceback.print_exc()
+    except BaseException:
+        try:
+            traceback.print_exc()
+        except BaseException:
+            pass
+    finally:
+        os._exit(code)
+
+def _import_modules(modules):
+    ''' import the modules (or .py files), but without letting them use the server's stdin or stdout '''
+    # they may do anything at import time, e.g., a helper file without an "if __name__ == '__main__'" guard that reads
+    # its input. so stdin is empty, stdout goes to stderr, and their errors (even exit()) are ignored. the standard
+    # streams themselves are kept, since the modules may capture them (e.g., as default arguments)
+    sys.stdout.flush()
+    saved = os.dup(0), os.dup(1)
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(2, 1)
+    os.close(devnull)
+    # the builtin exit() also closes sys.stdin
+    quitters = builtins.exit, builtins.quit
+    builtins.exit = builtins.quit = sys.exit
+    try:
+        for module in modules:
+            try:
+                if os.path.isfile(module):
+                    # a helper file, e.g., a formatter beside the generators
+                    sys.path.insert(0, os.path.dirname(os.path.abspath(module)))
+                    module = os.path.splitext(os.path.basename(module))[0]
+                importlib.import_module(module)
+            except BaseException as exc:
+                print(f"The fork server couldn't import {module}: {exc!r}", file=sys.__stderr__)
+            finally:
+                sys.stdin, sys.stdout, sys.stderr = sys.__stdin__, sys.__stdout__, sys.__stderr__
+                sys.stdout.flush()
+    finally:
+        builtins.exit, builtins.quit = quitters
+        for target, fd in enumerate(saved):
+            os.dup2(fd, target)
+            os.close(fd)
+
+def serve(path, modules=()):
+    _import_modules([*_preload, *modules])
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(64)
+
+    # SIGCHLD wakes up the selector through this pipe
+    wakeup_r, wakeup_w = os.pipe()
+    os.set_blocking(wakeup_r, False)
+    os.set_blocking(wakeup_w, False)
+    signal.set_wakeup_fd(wakeup_w)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+
+    # Ctrl+C is for the programs (and kg); the server stops once kg closes its stdin
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ)
+    selector.register(wakeup_r, selectors.EVENT_READ)
+    selector.register(sys.stdin, selectors.EVENT_READ)
+
+    jobs = {}  # pid -> connection
+
+    def start(conn):
+        request, fds = _recv_request(conn)
+        if len(fds) != _FD_COUNT: raise ForkServerError(f"Expected {_FD_COUNT} file descriptors, got {len(fds)}")
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            signal.set_wakeup_fd(-1)
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            selector.close()
+            for sock in [listener, conn, *jobs.values()]: sock.close()
+            os.close(wakeup_r)
+            os.close(wakeup_w)
+            _run_child(request, fds)
+        for fd in fds: os.close(fd)
+        conn.sendall(f'{pid}\n'.encode())
+        jobs[pid] = conn
+
+    def reap():
+        while jobs:
+            try:
+                pid, status, rusage = os.wait4(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0: return
+            conn = jobs.pop(pid, None)
+            if conn is None: continue
+            try:
+                conn.sendall(json.dumps({
+                    'returncode': _returncode(status),
+                    'cpu_time': rusage.ru_utime + rusage.ru_stime,
+                    'max_memory': rusage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024),
+                }).encode() + b'\n')
+            except OSError:
+                pass  # the client is gone
+            finally:
+                conn.close()
+
+    sys.stdout.write('ready\n')
+    sys.stdout.flush()
+    while True:
+        for key, events in selector.select():
+            if key.fileobj is listener:
+                conn, addr = listener.accept()
+                try:
+                    start(conn)
+                except Exception:
+                    traceback.print_exc()
+                    conn.close()
+            elif key.fileobj is sys.stdin:
+                if not os.read(sys.stdin.fileno(), 1 << 10):
+                    # kg is done (or gone)
+                    for pid in jobs: os.kill(pid, signal.SIGKILL)
+                    return
+            else:
+                while True:
+                    try:
+                        if not os.read(wakeup_r, 1 << 10): break
+                    except BlockingIOError:
+                        break
+                reap()
+
+
+# client side
+
+class ForkServer:
+    '''
+    Starts the fork server with the given python3 command (it should be the one that runs the programs), and runs
+    programs through it. It's a context manager; the server is stopped on exit.
+    '''
+    def __init__(self, python3, modules=(), *, timeout=60):
+        self.dir = tempfile.mkdtemp(prefix='kg_tmp_zygote_')
+        self.path = os.path.join(self.dir, 'socket')
+        self.process = subprocess.Popen([python3, '-m', 'kg.script.zygote', self.path, *modules],
+                stdin=PIPE, stdout=PIPE)
+        # the modules may take forever to import
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.process.stdout, selectors.EVENT_READ)
+            ready = selector.select(timeout) and self.process.stdout.readline() == b'ready\n'
+        if not ready:
+            self.close()
+            raise ForkServerError("The fork server failed to start")
+
+    @staticmethod
+    def supported():
+        return hasattr(os, 'fork') and hasattr(os, 'wait4') and hasattr(socket, 'AF_UNIX')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.process.stdin.close()
+        try:
+            self.process.wait(timeout=5)
+        except TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process.stdout.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def popen(self, args, **kwargs):
+        return ForkServerProcess(self, args, **kwargs)
+
+
+class ForkServerProcess:
+    '''
+    A program started by the fork server. This has the parts of the Popen interface that kg needs (communicate, poll,
+    kill, etc.), and also the usage() of _Process. args must be a python3 command, i.e., [python3, file, args...].
+    '''
+    def __init__(self, server, args, *, stdin=None, stdout=None, stderr=None, cwd=None):
+        self.args = args
+        self.returncode = None
+        self._usage = None, None
+        self._buffer = b''
+        self._pipes = {}
+        self._readers = None
+
+        fds = []
+        to_close = []
+        try:
+            for name, stream in zip(['stdin', 'stdout', 'stderr'], [stdin, stdout, stderr]):
+                if stream is None:
+                    fd = len(fds)  # inherited
+                elif stream == DEVNULL:
+                    fd = os.open(os.devnull, os.O_RDWR)
+                    to_close.append(fd)
+                elif stream == PIPE:
+                    if name == 'stdin': raise ForkServerError("stdin can't be a pipe")
+                    self._pipes[name], fd = os.pipe()
+                    to_close.append(fd)
+                elif stream == STDOUT and name == 'stderr':
+                    fd = fds[1]
+                elif isinstance(stream, int):
+                    fd = stream
+                else:
+                    fd = stream.fileno()
+                fds.append(fd)
+
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.connect(server.path)
+            request = json.dumps({'argv': [*args[1:]], 'cwd': os.path.abspath(cwd or os.getcwd())}).encode() + b'\n'
+            self._sock.sendmsg([request], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', fds))])
+        finally:
+            for fd in to_close: os.close(fd)
+        self.pid = int(self._readline())
+
+    def _readline(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while b'\n' not in self._buffer:
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0: raise TimeoutExpired(self.args, timeout)
+                self._sock.settimeout(remaining)
+            try:
+                chunk = self._sock.recv(1 << 12)
+            except socket.timeout:
+                raise TimeoutExpired(self.args, timeout)
+            finally:
+                self._sock.settimeout(None)
+            if not chunk: raise ForkServerError("The fork server closed the connection")
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return line
+
+    def communicate(self, input=None, timeout=None):
+        if input is not None: raise ForkServerError("input is not supported")
+        if self._readers is None:
+            # read the pipes in the background (like Popen does on Windows), so the program never blocks on them
+            self._outputs = {}
+            def read(name, fd):
+                with open(fd, 'rb') as f:
+                    self._outputs[name] = f.read()
+            self._readers = [Thread(target=read, args=item, daemon=True) for item in self._pipes.items()]
+            for reader in self._readers: reader.start()
+        if self.returncode is None:
+            result = json.loads(self._readline(timeout))
+            self.returncode = result['returncode']
+            self._usage = result['cpu_time'], result['max_memory']
+        for reader in self._readers: reader.join()
+        return self._outputs.get('stdout'), self._outputs.get('stderr')
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        self.communicate(timeout=timeout)
+        return self.returncode
+
+    def kill(self):
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def usage(self):
+        ''' the cpu time (in seconds) and max memory (in bytes) of the program, or Nones if unavailable '''
+        return self._usage
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            if self.returncode is None: self.wait()
+        finally:
+            self._sock.close()
+
+
+if __name__ == '__main__':
+    serve(sys.argv[1], sys.argv[2:])
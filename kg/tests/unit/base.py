@@ -0,0 +1,35 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from ...script.utils import kg_path
+
+def this_kg_environ():
+    ''' the environment variables that make the programs run by the tests import this kg '''
+    return {'PYTHONPATH': os.pathsep.join(filter(None, [os.path.dirname(kg_path), os.environ.get('PYTHONPATH')]))}
+
+class FilesTestCase(unittest.TestCase):
+    ''' a test case with a fresh temporary folder (self.dir) for its files '''
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def use_this_kg(self):
+        ''' make the programs run by the test (and their workers) import this kg '''
+        environ = mock.patch.dict(os.environ, this_kg_environ())
+        environ.start()
+        self.addCleanup(environ.stop)
+
+    def path(self, filename):
+        return os.path.join(self.dir.name, filename)
+
+    def write(self, filename, content):
+        with open(self.path(filename), 'w', encoding='utf-8', newline='') as f:
+            f.write(content)
+        return self.path(filename)
+
+    def read(self, filename):
+        with open(self.path(filename), encoding='utf-8', newline='') as f:
+            return f.read()
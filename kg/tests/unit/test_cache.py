@@ -0,0 +1,101 @@
+import os
+import unittest
+from unittest import mock
+
+from .base import FilesTestCase
+from ...script.cache import Cache, CompileCache, data_hash
+from ...script.programs import Program
+from ...script.script import _checker_key, _solution_key
+
+class TestCache(FilesTestCase):
+
+    def test_data_hash(self):
+        self.assertEqual(data_hash('a', [1, 2], {'x': 1, 'y': 2}), data_hash('a', [1, 2], {'y': 2, 'x': 1}))
+        self.assertNotEqual(data_hash('a', [1, 2]), data_hash('a', [2, 1]))
+        self.assertNotEqual(data_hash('a', 1), data_hash('a', '1'))
+        self.assertNotEqual(data_hash('a', None), data_hash('a'))
+
+    def test_get_put(self):
+        cache = Cache(self.dir.name, 'test')
+        key = data_hash('key')
+        self.assertIsNone(cache.get(key))
+
+        cache.put(key, {'outcome': 'OK', 'running_time': 0.5}, output=self.write('out', 'hello\n'))
+        self.assertEqual(cache.get(key, output=self.path('copy')), {'outcome': 'OK', 'running_time': 0.5})
+        self.assertEqual(self.read('copy'), 'hello\n')
+
+        # entries are never modified
+        cache.put(key, {'outcome': 'RE'}, output=self.write('out', 'bye\n'))
+        self.assertEqual(cache.get(key, output=self.path('copy')), {'outcome': 'OK', 'running_time': 0.5})
+        self.assertEqual(self.read('copy'), 'hello\n')
+
+        # an entry without the requested file is a miss
+        self.assertIsNone(cache.get(key, result=self.path('result')))
+
+    def test_keys(self):
+        def solution(content='print(input())\n'):
+            self.write('sol.py', content)
+            # a new program each time, since the hash of a program is remembered
+            return Program.from_data('sol.py', relpath=self.dir.name)
+
+        inp = self.write('1.in', '1\n')
+        key = _solution_key(solution(), inp, 2, None)
+        self.assertEqual(_solution_key(solution(), inp, 2, None), key)
+        for other in [
+            _solution_key(solution('print(input() * 2)\n'), inp, 2, None),
+            _solution_key(solution(), self.write('2.in', '2\n'), 2, None),
+            _solution_key(solution(), inp, 3, None),
+            _solution_key(solution(), inp, 2, {'memory': 1 << 28}),
+        ]:
+            self.assertNotEqual(other, key)
+
+        files = [self.write('in', '1\n'), self.write('out', '1\n'), self.write('ans', '1\n')]
+        checker = solution('print(0)\n')
+        def helpers(content='X = 1\n'):
+            self.write('helper.py', content)
+            return [Program.from_data('helper.py', relpath=self.dir.name)]
+
+        key = _checker_key(checker, helpers(), False, False, 0, *files)
+        self.assertEqual(_checker_key(solution('print(0)\n'), helpers(), False, False, 0, *files), key)
+        for other in [
+            _checker_key(solution('print(1)\n'), helpers(), False, False, 0, *files),
+            _checker_key(checker, helpers('X = 2\n'), False, False, 0, *files),  # a helper the checker imports
+            _checker_key(checker, [], False, False, 0, *files),
+            _checker_key(checker, helpers(), True, False, 0, *files),
+            _checker_key(checker, helpers(), False, True, 0, *files),  # the checker is told that the files are identical
+            _checker_key(checker, helpers(), False, False, 1, *files),  # the checker gets the index as tc_id
+            _checker_key(checker, helpers(), False, False, 0, files[0], self.write('out2', '2\n'), files[2]),
+        ]:
+            self.assertNotEqual(other, key)
+        # with strict args, the checker doesn't get the index
+        self.assertEqual(_checker_key(checker, helpers(), True, False, 0, *files),
+                _checker_key(checker, helpers(), True, False, 1, *files))
+
+    def test_compile_keys(self):
+        cache = CompileCache()
+        cache.max_size = 1 << 20
+
+        # an unknown compile command (e.g., a build script) isn't cached, and isn't run to get its version either
+        self.write('build.sh', 'touch ran\n')
+        self.write('prog.x', '')
+        program = Program('prog.x', ['sh', 'build.sh'], ['./prog'], relpath=self.dir.name)
+        self.assertIsNone(cache.key(program))
+        self.assertFalse(os.path.exists(self.path('ran')))
+
+        # javac also compiles the other classes in the folder
+        self.write('Main.java', 'class Main {}\n')
+        self.write('Helper.java', 'class Helper {}\n')
+        with mock.patch(f'{CompileCache.__module__}.compiler_version', return_value='javac 17'):
+            main = Program.from_data('Main.java', relpath=self.dir.name)
+            key = cache.key(main)
+            self.assertIsNotNone(key)
+            self.write('Helper.java', 'class Helper { int x; }\n')
+            self.assertNotEqual(cache.key(main), key)
+
+        self.write('Main.class', '')
+        self.write('Helper.class', '')
+        self.write('Main$Inner.class', '')
+        self.assertEqual(set(map(os.path.basename, cache.outputs(main))), {'Main.class', 'Helper.class', 'Main$Inner.class'})
+
+if __name__ == '__main__':
+    unittest.main()
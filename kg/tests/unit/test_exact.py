@@ -0,0 +1,67 @@
+import contextlib
+import io
+import unittest
+from unittest import mock
+
+from .base import FilesTestCase
+from ...diff import exact
+from ...diff.exact import check_exactly_equal, diff_excerpt, files_are_identical, find_mismatch
+from ...checkers import Wrong
+
+class TestExact(FilesTestCase):
+
+    def test_find_mismatch(self):
+        lines = [f'{index}\n' for index in range(10)]
+        self.assertIsNone(find_mismatch(lines, [*lines]))
+        self.assertIsNone(find_mismatch([], []))
+        for index in [0, 5, 9]:
+            other = [*lines]
+            other[index] = 'x\n'
+            self.assertEqual(find_mismatch(lines, other), (index, lines[:index], lines[index], 'x\n'))
+        # only the last few lines before the mismatch are kept
+        self.assertEqual(find_mismatch(lines, lines[:9] + ['x\n'], context=2), (9, lines[7:9], '9\n', 'x\n'))
+
+    def test_find_mismatch_lengths(self):
+        lines = ['a\n', 'b\n', 'c\n']
+        self.assertEqual(find_mismatch(lines, lines[:2]), (2, lines[:2], 'c\n', None))
+        self.assertEqual(find_mismatch(lines[:2], lines), (2, lines[:2], None, 'c\n'))
+        self.assertEqual(find_mismatch([], lines), (0, [], None, 'a\n'))
+
+    def test_diff_excerpt(self):
+        # the window starts at line 11 (offset 10) of the files
+        self.assertEqual(diff_excerpt(['a', 'b'], ['c', 'd'], ['c', 'e'], offset=10, lineterm=''),
+                ['--- ', '+++ ', '@@ -11,4 +11,4 @@', ' a', ' b', ' c', '-d', '+e'])
+        self.assertEqual(diff_excerpt([], ['a'], ['b'], offset=0, lineterm=''),
+                ['--- ', '+++ ', '@@ -1 +1 @@', '-a', '+b'])
+        self.assertEqual(diff_excerpt(['a'], ['b'], [], offset=99, lineterm='')[2], '@@ -100,2 +100 @@')
+
+    def test_files_are_identical(self):
+        content = ''.join(f'{index}\n' for index in range(100))
+        path = self.write('a', content)
+        # small chunks, so the files are compared over several reads
+        with mock.patch.object(exact, 'CHUNK', 16):
+            self.assertTrue(files_are_identical(path, self.write('b', content)))
+            self.assertFalse(files_are_identical(path, self.write('c', content[:-2] + 'x\n')))
+            self.assertFalse(files_are_identical(path, self.write('d', content[:-1])))
+            self.assertTrue(files_are_identical(self.write('e', ''), self.write('f', '')))
+        self.assertFalse(files_are_identical(path, self.path('missing')))
+        self.assertFalse(files_are_identical(path, None))
+
+    def test_non_ascii(self):
+        # byte-identical, but not ASCII, so they're compared line by line instead
+        content = 'é\nü\n'
+        output_path, judge_path = self.write('out', content), self.write('ans', content)
+        self.assertFalse(files_are_identical(output_path, judge_path))
+
+        def check(output, judge):
+            with io.StringIO(output) as output_file, io.StringIO(judge) as judge_file:
+                return check_exactly_equal(io.StringIO(''), output_file, judge_file,
+                        output_path=output_path, judge_path=judge_path)
+
+        self.assertEqual(check(content, content), 1.0)
+        with contextlib.redirect_stdout(io.StringIO()) as out, self.assertRaises(Wrong):
+            check(content, 'é\nu\n')
+        self.assertIn('-ü\n+u', out.getvalue().replace('\n\n', '\n'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import subprocess
+import unittest
+
+from .base import FilesTestCase
+from ...script.inprocess import CheckerPool, GeneratorPool
+from ...script.programs import Program
+
+# keeps global state, so it only accepts the first file it checks in a process
+CHECKER = '''\
+from kg.checkers import *
+
+checked = []
+
+@checker(extra_chars_allowed=['input', 'output', 'judge'])
+def check(input_stream, output_stream, judge_stream, **kwargs):
+    checked.append(1)
+    if len(checked) > 1: raise Wrong("checked more than one file in the same process")
+    return 1.0
+
+if __name__ == '__main__':
+    check_files(check)
+'''
+
+# a helper file beside the generator, also with global state
+HELPER = '''\
+count = 0
+
+def next_count():
+    global count
+    count += 1
+    return count
+'''
+
+GENERATOR = '''\
+from sys import *
+from kg.generators import *
+from helper import next_count
+
+def gen(rand, *args):
+    return next_count()
+
+def format_case(file, case):
+    print(case, file=file)
+
+if __name__ == '__main__':
+    write_to_file(format_case, gen, argv[1:], stdout)
+'''
+
+class TestPools(FilesTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.use_this_kg()
+        for name, content in [('checker.py', CHECKER), ('helper.py', HELPER), ('gen.py', GENERATOR), ('data.txt', '1\n')]:
+            self.write(name, content)
+
+    def program(self, filename):
+        return Program.from_data(filename, relpath=self.dir.name).do_compile()
+
+    def test_checker_pool(self):
+        checker = self.program('checker.py')
+        args = [self.path('data.txt')] * 3
+        expected = [checker.do_run(*args, check=False, stdout=subprocess.PIPE).result.returncode for it in range(3)]
+        with CheckerPool(1) as pool:
+            self.assertTrue(pool.supports(checker))
+            self.assertEqual([pool.run(checker, *args)[0] for it in range(3)], expected)
+        self.assertEqual(expected, [0, 0, 0])
+
+    def test_generator_pool(self):
+        gen = self.program('gen.py')
+        output = self.path('out.txt')
+        with GeneratorPool(1) as pool:
+            self.assertTrue(pool.supports(gen))
+            for it in range(3):
+                pool.run(gen, str(it), stdout=output)
+                with open(output) as f:
+                    self.assertEqual(f.read(), gen.do_run(str(it), stdout=subprocess.PIPE).result.stdout.decode())
+
+if __name__ == '__main__':
+    unittest.main()
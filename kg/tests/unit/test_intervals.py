@@ -0,0 +1,27 @@
+import unittest
+
+from ...utils.intervals import Intervals, Var
+
+class TestIntervals(unittest.TestCase):
+
+    def test_contains(self):
+        I = Intervals.from_tokens
+        intervals = I('[', -float('inf'), -100, ']', '[', 15, 25, ')', '(', 25, 30, ')', '[', 41, 41, ']')
+        for value, expected in [
+            (-10**18, True), (-100, True), (-99, False),
+            (15, True), (24.5, True), (25, False), (29, True), (30, False),
+            (41, True), (40.9, False), (41.1, False), (float('inf'), False),
+        ]:
+            self.assertEqual(value in intervals, expected, value)
+            self.assertEqual(value in ~intervals, not expected, value)
+        self.assertNotIn(0, Intervals([]))
+
+    def test_contains_all(self):
+        self.assertTrue((1 <= +Var <= 10).intervals.contains_all([1, 5, 10]))
+        self.assertFalse((1 <= +Var <= 10).intervals.contains_all([1, 11, 5]))
+        self.assertTrue((1 <= +Var <= 10).intervals.contains_all([]))
+        self.assertTrue((+Var != 3).intervals.contains_all(iter([1, 2, 4])))
+        self.assertFalse((+Var != 3).intervals.contains_all(iter([1, 3, 4])))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+import unittest
+from unittest import mock
+
+from .base import FilesTestCase
+from ...script.programs import KillSwitch, Program, _Process, _python3_probe_cache, _python3_probe_hit, _save_python3_probe
+
+# uses about 0.3 sec. of CPU time and 64 MiB of memory
+BUSY = '''\
+import time
+data = bytearray(64 << 20)
+end = time.process_time() + 0.3
+while time.process_time() < end: pass
+'''
+
+class TestPython3Probe(FilesTestCase):
+
+    def setUp(self):
+        super().setUp()
+        environ = mock.patch.dict(os.environ, {'KG_CACHE_DIR': self.dir.name})
+        environ.start()
+        self.addCleanup(environ.stop)
+        self.kg_file = self.write('__init__.py', '')
+
+    def test_hit(self):
+        _save_python3_probe('key', 'python3.11', self.kg_file)
+        self.assertEqual(_python3_probe_hit(_python3_probe_cache().get('key')), 'python3.11')
+
+        # kg was reinstalled for that command
+        info = os.stat(self.kg_file)
+        os.utime(self.kg_file, ns=(info.st_atime_ns, info.st_mtime_ns + 10**9))
+        self.assertIsNone(_python3_probe_hit(_python3_probe_cache().get('key')))
+
+        # kg was uninstalled for that command
+        _save_python3_probe('key', 'python3.11', self.kg_file)
+        os.remove(self.kg_file)
+        self.assertIsNone(_python3_probe_hit(_python3_probe_cache().get('key')))
+
+    def test_old_format(self):
+        self.assertIsNone(_python3_probe_hit('python3.11'))
+        self.assertIsNone(_python3_probe_hit(None))
+
+@unittest.skipUnless(hasattr(os, 'wait4'), "needs os.wait4")
+class TestUsage(FilesTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('busy.py', BUSY)
+
+    def assertBusyUsage(self, cpu_time, max_memory):
+        self.assertGreaterEqual(cpu_time, 0.3)
+        self.assertLess(cpu_time, 10)
+        self.assertGreaterEqual(max_memory, 64 << 20)
+
+    def test_do_run(self):
+        self.use_this_kg()
+        res = Program.from_data('busy.py', relpath=self.dir.name).do_compile().do_run()
+        self.assertBusyUsage(res.cpu_time, res.max_memory)
+
+    def test_reaped_by_poll(self):
+        # Popen reaps the process in poll() differently from wait()
+        with _Process([sys.executable, self.path('busy.py')]) as process:
+            while process.poll() is None: time.sleep(0.01)
+            self.assertBusyUsage(*process.usage())
+
+@unittest.skipUnless(hasattr(os, 'killpg'), "needs process groups")
+class TestProcessControl(FilesTestCase):
+
+    def start(self, code, **kwargs):
+        return _Process([sys.executable, '-c', code], **kwargs)
+
+    def test_limits(self):
+        # the kernel kills the process once it exceeds the cpu limit...
+        with self.start('while True: pass', limits={'cpu': 1}) as process:
+            self.assertIn(process.wait(timeout=30), (-signal.SIGXCPU, -signal.SIGKILL))
+
+        # ...and doesn't let it allocate more than the memory limit
+        with self.start('data = bytearray(512 << 20)', limits={'memory': 256 << 20}, stderr=subprocess.PIPE) as process:
+            stdout, stderr = process.communicate(timeout=30)
+            self.assertNotEqual(process.returncode, 0)
+            self.assertIn(b'MemoryError', stderr)
+
+    def test_kill_group(self):
+        # the grandchild writes its pid, then sleeps; it's killed along with the child
+        pid_file = self.path('pid')
+        code = (f'import os, subprocess, sys, time\n'
+                f'subprocess.Popen([sys.executable, "-c", "import os, time\\n'
+                f'open({pid_file!r}, \'w\').write(str(os.getpid()))\\ntime.sleep(60)"])\n'
+                f'time.sleep(60)\n')
+        with self.start(code, own_group=True) as process:
+            for it in range(1000):
+                if os.path.exists(pid_file) and self.read('pid'): break
+                time.sleep(0.01)
+            grandchild = int(self.read('pid'))
+            process.kill()
+            self.assertEqual(process.wait(timeout=10), -signal.SIGKILL)
+
+        # the grandchild isn't ours to reap, so wait until it's gone
+        for it in range(1000):
+            try:
+                os.kill(grandchild, 0)
+            except ProcessLookupError:
+                break
+            time.sleep(0.01)
+        else:
+            os.kill(grandchild, signal.SIGKILL)
+            self.fail("the grandchild wasn't killed")
+
+    def test_kill_switch(self):
+        kill_switch = KillSwitch()
+        with self.start('import time; time.sleep(60)', kill_switch=kill_switch) as running, \
+                self.start('pass', kill_switch=kill_switch) as finished:
+            finished.wait(timeout=10)
+            kill_switch.flip()
+            self.assertEqual(running.wait(timeout=10), -signal.SIGKILL)
+            self.assertEqual(finished.returncode, 0)
+        self.assertTrue(kill_switch.flipped)
+
+        # processes started after the flip are killed right away
+        with self.start('import time; time.sleep(60)', kill_switch=kill_switch) as process:
+            self.assertEqual(process.wait(timeout=10), -signal.SIGKILL)
+
+if __name__ == '__main__':
+    unittest.main()
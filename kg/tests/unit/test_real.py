@@ -0,0 +1,90 @@
+import contextlib
+import io
+import random
+import unittest
+from unittest import mock
+
+from ...checkers import Wrong
+from ...diff import real_abs_1e_6, real_abs_rel_1e_6, real_abs_rel_1e_9
+
+def _check(module, output, judge):
+    ''' the verdict of module's checker (the score or the error), and the worst error it printed '''
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        try:
+            verdict = module.check_real(io.StringIO(''), io.StringIO(output), io.StringIO(judge))
+        except Wrong as exc:
+            verdict = str(exc)
+    return verdict, out.getvalue()
+
+def _check_decimal(module, output, judge):
+    ''' like _check, but every pair of unequal tokens is compared with Decimal '''
+    with mock.patch.object(module, 'float_error_bounds', lambda values1, values2: None):
+        return _check(module, output, judge)
+
+class TestRealCheckers(unittest.TestCase):
+
+    def assertSameAsDecimal(self, module, output, judge, accepted):
+        verdict = _check(module, output, judge)
+        self.assertEqual(verdict, _check_decimal(module, output, judge))
+        self.assertEqual(verdict[0] == 1.0, accepted, verdict)
+
+    def test_boundary(self):
+        # the allowed error is 1e-6 (plus a leniency of 1e-11), which floats can't tell apart from the values nearby
+        for judge, output, abs_accepted, rel_accepted in [
+            ('1\n', '1.000001\n', True, True),
+            ('1\n', '1.00000100001\n', True, True),
+            ('1\n', '1.000001000011\n', False, True),  # relative to 1.000001000011
+            ('1\n', '0.999998999989\n', False, False),
+            ('-3 0.5\n', '-3.000001 0.5\n', True, True),
+            ('0\n', '-0.00000100001\n', True, True),
+            ('0\n', '0.000001000010000001\n', False, False),
+        ]:
+            with self.subTest(judge=judge, output=output):
+                self.assertSameAsDecimal(real_abs_1e_6, output, judge, abs_accepted)
+                self.assertSameAsDecimal(real_abs_rel_1e_6, output, judge, rel_accepted)
+
+        # relative to the larger value
+        self.assertSameAsDecimal(real_abs_rel_1e_6, '1000001.00001\n', '1000000\n', True)
+        self.assertSameAsDecimal(real_abs_rel_1e_6, '1000001.00002\n', '1000000\n', False)
+        self.assertSameAsDecimal(real_abs_1e_6, '1000001.00001\n', '1000000\n', False)
+
+    def test_decimal_fallback(self):
+        for judge, output, abs_accepted, rel_accepted in [
+            # beyond the floats
+            ('1e400\n', '1.0000000001e400\n', False, True),
+            ('1e400\n', '1e400\n', True, True),
+            ('-1e-400\n', '1e-400\n', True, True),
+            # more digits than a float has
+            ('0.1\n', '0.1000000000000000000000000001\n', True, True),
+            ('123456789012345678901234567890.5\n', '123456789012345678901234567890.5000001\n', True, True),
+            ('123456789012345678901234567890.5\n', '123456789012345678901234567890.500002\n', False, True),
+            ('12345678901234567890\n', '12345678901234567891\n', False, True),
+            # not plain reals
+            ('1000\n', '1_000\n', True, True),
+            ('0x10\n', '16\n', False, False),
+            ('abc\n', 'abd\n', False, False),
+        ]:
+            with self.subTest(judge=judge, output=output):
+                self.assertSameAsDecimal(real_abs_1e_6, output, judge, abs_accepted)
+                self.assertSameAsDecimal(real_abs_rel_1e_6, output, judge, rel_accepted)
+
+    def test_many_values(self):
+        # several batches, so most values are skipped by the bound; the worst error may be anywhere
+        rand = random.Random(42)
+        judge = [rand.choice([-1, 1]) * rand.uniform(1, 1e6) for it in range(3 * real_abs_rel_1e_9.BATCH + 5)]
+        for worst_at in [0, len(judge) // 2, len(judge) - 1]:
+            for worst in [1e-9, 1.00002e-9]:
+                with self.subTest(worst_at=worst_at, worst=worst):
+                    output = [value * (1 + rand.uniform(-1e-10, 1e-10)) for value in judge]
+                    output[worst_at] = judge[worst_at] * (1 + worst)
+                    # many digits, so the floats are only approximations
+                    judge_text = '\n'.join(' '.join(f'{value:.20f}' for value in judge[i:i+7])
+                            for i in range(0, len(judge), 7)) + '\n'
+                    output_text = '\n'.join(' '.join(f'{value:.25f}' for value in output[i:i+7])
+                            for i in range(0, len(output), 7)) + '\n'
+                    # the floats are used, not only Decimal
+                    self.assertIsNotNone(real_abs_rel_1e_9.float_error_bounds(output_text.split(), judge_text.split()))
+                    self.assertSameAsDecimal(real_abs_rel_1e_9, output_text, judge_text, worst < 1.00001e-9)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+from ...script.programs import KillSwitch
+from ...script.script import _record_file, _skip_file, _timing_stats
+
+class TestTimingStats(unittest.TestCase):
+
+    def test_timing_stats(self):
+        for times, expected in [
+            # (min, median, p95, noisy)
+            ([0.5], (0.5, 0.5, 0.5, False)),
+            ([0.3, 0.1], (0.1, 0.2, 0.3, True)),
+            ([1.1, 1.0, 1.05, 1.02], (1.0, 1.035, 1.1, False)),
+            ([1.0, 1.2, 1.1], (1.0, 1.1, 1.2, False)),
+            # p95 is the 19th of 20 runs (nearest rank), so a single slow run is ignored...
+            ([5.0] + [1.0] * 19, (1.0, 1.0, 1.0, False)),
+            # ...but not two
+            ([5.0, 5.0] + [1.0] * 18, (1.0, 1.0, 5.0, True)),
+            ([5.0, 5.0] + [1.0] * 19, (1.0, 1.0, 5.0, True)),
+            # tiny differences don't count, even if they're large relative to the running time
+            ([0.015, 0.001], (0.001, 0.008, 0.015, False)),
+            ([0.03, 0.001], (0.001, 0.0155, 0.03, True)),
+        ]:
+            with self.subTest(times=times):
+                *stats, noisy = _timing_stats(times)
+                for stat, value in zip(stats, expected):
+                    self.assertAlmostEqual(stat, value)
+                self.assertEqual(noisy, expected[-1])
+
+class TestUntilFailure(unittest.TestCase):
+
+    def test_fail_fast(self):
+        # one kill switch for all the solutions, so once one of them fails, the others stop too
+        kill_switch = KillSwitch()
+        self.assertIsNone(_skip_file(kill_switch, None, None))
+        self.assertTrue(_record_file(kill_switch, None, None, 'AC', 1))
+        self.assertFalse(kill_switch.flipped)
+        self.assertTrue(_record_file(kill_switch, None, None, 'WA', 0))
+        self.assertTrue(kill_switch.flipped)
+        self.assertEqual(_skip_file(kill_switch, None, None), 'stopped')
+        # even with --skip-failed-subtasks, for a solution that hasn't failed anything
+        self.assertEqual(_skip_file(kill_switch, set(), ['1']), 'stopped')
+        # the files still running were probably killed, so their results are dropped
+        self.assertFalse(_record_file(kill_switch, None, None, 'RE', 0))
+
+    def test_skip_failed_subtasks(self):
+        # each solution has its own failed subtasks
+        failed = {'sol1': set(), 'sol2': set()}
+        self.assertTrue(_record_file(None, failed['sol1'], ['1', '2'], 'AC', 1))
+        self.assertTrue(_record_file(None, failed['sol1'], ['2', '3'], 'WA', 0))
+        self.assertEqual(failed, {'sol1': {'2', '3'}, 'sol2': set()})
+        self.assertEqual(_skip_file(None, failed['sol1'], ['2']), 'failed')
+        self.assertEqual(_skip_file(None, failed['sol1'], ['3', '2']), 'failed')
+        self.assertIsNone(_skip_file(None, failed['sol1'], ['1', '2']))
+        self.assertIsNone(_skip_file(None, failed['sol2'], ['2']))
+        # a partial score doesn't fail the subtasks
+        self.assertTrue(_record_file(None, failed['sol2'], ['1'], 'WA', 0.5))
+        self.assertEqual(failed['sol2'], set())
+
+    def test_both(self):
+        kill_switch = KillSwitch()
+        failed = set()
+        self.assertTrue(_record_file(kill_switch, failed, ['1'], 'TLE', 0))
+        self.assertEqual(failed, {'1'})
+        self.assertEqual(_skip_file(kill_switch, failed, ['2']), 'stopped')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import io
+import os
+import tempfile
+import unittest
+
+from ...utils.streams import InteractiveStream, ISMode, MmapLineReader, StreamError
+
+class TestInteractiveStream(unittest.TestCase):
+
+    def test_tokens(self):
+        s = InteractiveStream(io.StringIO('  1 22\n\n  \n333   4\n'), mode=ISMode.TOKENS)
+        self.assertEqual(s.read_token(), '1')
+        self.assertEqual(s.peek(), '22')
+        self.assertEqual(s.read_token(), '22')
+        self.assertEqual(s.read_ints(2, 0, 1000), [333, 4])
+        with self.assertRaises(StreamError): s.read_token()
+        s.close()
+
+    def test_tokens_strict(self):
+        s = InteractiveStream(io.StringIO('1  2\n'))
+        self.assertEqual(s.read_token(), '1')
+        s.read_space()
+        self.assertEqual(s.read_token(), '')
+        s.read_space()
+        self.assertEqual(s.read_ints(1, 0, 5), [2])
+        s.read_eoln()
+        s.close()
+
+    def test_lines(self):
+        s = InteractiveStream(io.StringIO('a b  \n\nc'), mode=ISMode.LINES)
+        self.assertEqual(list(s), ['a b', '', 'c'])
+        s.close()
+
+    def _read_file(self, data, **kwargs):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'data')
+            with open(path, 'wb') as f: f.write(data)
+            with open(path, encoding='utf-8') as f, InteractiveStream(f, mode=ISMode.LINES, **kwargs) as s:
+                return list(s)
+
+    def test_mmap(self):
+        data = 'a b\r\nc\rdé\n\n中 e\nf'.encode()
+        chunk = MmapLineReader._CHUNK
+        try:
+            MmapLineReader._CHUNK = 3
+            self.assertEqual(self._read_file(data, use_mmap=True), self._read_file(data))
+            self.assertEqual(self._read_file(data, use_mmap=True), ['a b', 'c', 'dé', '', '中 e', 'f'])
+            with self.assertRaises(StreamError): self._read_file(b'1\n\xff\n', use_mmap=True)
+        finally:
+            MmapLineReader._CHUNK = chunk
+        self.assertEqual(self._read_file(b'', use_mmap=True), [])
+
+if __name__ == '__main__':
+    unittest.main()
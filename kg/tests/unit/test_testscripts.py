@@ -0,0 +1,60 @@
+import os
+import unittest
+
+from .base import FilesTestCase
+from ...script.cache import Manifest
+from ...script.programs import Program
+from ...script.testscripts import run_testscript
+
+GENERATOR = '''\
+from sys import *
+from kg.generators import *
+from helper import VALUE
+
+def gen(rand, *args):
+    return VALUE
+
+def format_case(file, case):
+    print(case, file=file)
+
+if __name__ == '__main__':
+    write_to_file(format_case, gen, argv[1:], stdout)
+'''
+
+class TestIncremental(FilesTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.use_this_kg()
+        self.write('gen.py', GENERATOR)
+        self.write('helper.py', 'VALUE = 1\n')
+
+    def make(self):
+        ''' like "kg make inputs --incremental", with new programs (so nothing is remembered but the manifest) '''
+        loc = self.dir.name
+        manifest = Manifest(loc)
+        filenames = [*run_testscript(
+                iter([os.path.join(loc, f'{index}.in') for index in range(2)]),
+                'start=0\ngen 1 > $\ngen 2 > $\n',
+                [Program.from_data('gen.py', relpath=loc)],
+                relpath=loc,
+                manifest=manifest,
+                dependencies=[Program.from_data('helper.py', relpath=loc)],
+                max_workers=1)]
+        manifest.save()
+        contents = []
+        for filename in sorted(filenames):
+            with open(filename) as f:
+                contents.append((f.read(), os.stat(filename).st_mtime_ns))
+        return contents
+
+    def test_helper_changed(self):
+        made = self.make()
+        self.assertEqual([content for content, mtime in made], ['1\n', '1\n'])
+        # nothing changed, so nothing is remade
+        self.assertEqual(self.make(), made)
+        self.write('helper.py', 'VALUE = 2\n')
+        self.assertEqual([content for content, mtime in self.make()], ['2\n', '2\n'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+from array import array
+import io
+import tempfile
+import unittest
+
+from ...utils.intervals import Var
+from ...utils import EOLN
+from ...utils.parsers import ParsingError
+from ...validators import MmapInputStream, StrictInputStream, ValidationStreamError, detect_subtasks, validator
+
+class ChunkedReader(io.StringIO):
+    def read(self, n=-1):
+        return super().read(1 if n < 0 else min(n, 1))
+
+def _stream(s, *, chunked=False):
+    return StrictInputStream(ChunkedReader(s) if chunked else io.StringIO(s))
+
+class TestStrictInputStream(unittest.TestCase):
+
+    def test_tokens_across_chunks(self):
+        for chunked in [False, True]:
+            s = _stream('12 -3\nabc\n', chunked=chunked)
+            self.assertEqual(s.read_int(-100, 100), 12)
+            s.read_space()
+            self.assertEqual(s.read_int(-100, 100), -3)
+            s.read_eoln()
+            self.assertEqual(s.read_line(), 'abc')
+            s.read_eoln()
+            s.read_eof()
+
+    def test_lengths(self):
+        self.assertEqual(_stream('abcd\n').read_until('\n', n=4), 'abcd')
+        with self.assertRaises(ValidationStreamError): _stream('abcde\n').read_until('\n', n=4)
+        with self.assertRaises(ValidationStreamError): _stream('abc\n').read_until('\n', n=4)
+        with self.assertRaises(ValidationStreamError): _stream('abcde\n').read_until('\n', maxn=4)
+
+    def test_charset(self):
+        self.assertEqual(_stream('aab \n').read_until(' ', charset='ab'), 'aab')
+        with self.assertRaises(ValidationStreamError): _stream('abc \n').read_until(' ', charset='ab')
+        self.assertEqual(_stream('abba!').read_while('ab'), 'abba')
+
+    def test_eof(self):
+        with self.assertRaises(ValidationStreamError): _stream('abc').read_line()
+        with self.assertRaises(ValidationStreamError): _stream('1\n2').read_eof()
+        s = _stream('')
+        s.read_eof()
+    def test_read_ints(self):
+        for chunked in [False, True]:
+            s = _stream('3 -1 0 4\n5\n6\n', chunked=chunked)
+            self.assertEqual(s.read_ints(3, -5, 5), [3, -1, 0])
+            s.read_space()
+            self.assertEqual(s.read_ints(3, 0, 10, sep=[EOLN], as_array=True), array('q', [4, 5, 6]))
+            s.read_eoln()
+            s.read_eof()
+
+        # the same errors as reading them one by one
+        for data, args in [
+            ('1 2 x\n', (0, 5)),
+            ('1 02 3\n', (0, 5)),
+            ('1  2 3\n', (0, 5)),
+            ('1 2\n', (0, 5)),
+            ('1 2 6\n', (0, 5)),
+            ('1 2 6\n', ((+Var > 2).intervals,)),
+        ]:
+            with self.assertRaises(Exception) as bulk:
+                _stream(data).read_ints(3, *args)
+            with self.assertRaises(Exception) as single:
+                s = _stream(data)
+                for i in range(3):
+                    if i: s.read_space()
+                    s.read_int(*args)
+            self.assertEqual(str(bulk.exception), str(single.exception))
+
+    def test_read_ints_array_bounds(self):
+        big = 10**30
+        self.assertEqual(_stream('1 -2\n').read_ints(2, -(1 << 63), (1 << 63) - 1, as_array=True), array('q', [1, -2]))
+        self.assertEqual(_stream('1 2\n').read_ints(2, 1 << 63, as_array=True), array('q', [1, 2]))
+        self.assertEqual(_stream('1 2\n').read_ints(2, ((+Var >= 0) & (+Var <= 5)).intervals, as_array=True),
+                array('q', [1, 2]))
+        # bounds beyond int64 are rejected up front, even if the values fit
+        for args in [(-big, big), (0, 1 << 63), ((1 << 63) + 1,), ((+Var > 2).intervals,), ()]:
+            with self.subTest(args=args), self.assertRaises(ValidationStreamError):
+                _stream('1 99999999999999999999\n').read_ints(2, *args, as_array=True)
+            # the lists are fine
+            self.assertEqual(_stream('3 4\n').read_ints(2, *args), [3, 4])
+
+    def test_mmap(self):
+        for data, cls in [
+            ('3 ab\n', MmapInputStream),
+            ('3 \u00e9\n', StrictInputStream),  # non-ASCII
+            ('3 ab\r\n', StrictInputStream),    # newline translation
+        ]:
+            with tempfile.TemporaryFile('w+', encoding='utf-8') as f:
+                f.write(data)
+                f.seek(0)
+                s = StrictInputStream.from_file(f, use_mmap=True)
+                self.assertIsInstance(s, cls)
+                self.assertEqual(s.read_int(0, 5), 3)
+                s.read_space()
+                self.assertEqual(s.read_line(), data[2:-1].rstrip('\r'))
+                s.read_eoln()
+                s.read_eof()
+
+        with tempfile.TemporaryFile('w+', encoding='utf-8') as f:
+            f.write('ab c')
+            f.seek(0)
+            s = StrictInputStream.from_file(f, use_mmap=True)
+            with self.assertRaises(ValidationStreamError): s.read_until(' ', charset='a')
+            self.assertEqual(s.last, 'a')
+
+        # the validator closes the mapping once it's done, even if the file is invalid
+        streams = []
+        @validator(use_mmap=True)
+        def validate(stream):
+            streams.append(stream)
+            stream.read.int(0, 5).eoln
+
+        for data in ['3\n', '6\n']:
+            with tempfile.TemporaryFile('w+', encoding='utf-8') as f:
+                f.write(data)
+                f.seek(0)
+                try:
+                    validate(f)
+                except ParsingError:
+                    pass
+        self.assertEqual([type(stream) for stream in streams], [MmapInputStream] * 2)
+        self.assertTrue(all(stream._buf.closed for stream in streams))
+
+class TestDetectSubtasks(unittest.TestCase):
+
+    def test_single_pass(self):
+        bounds = {'n': 1 <= +Var <= 100, 'a': 0 <= +Var <= 100}
+        subtasks = {'1': {'n': 1 <= +Var <= 2}, '2': {'a': +Var <= 5}, '3': {}}
+
+        def validate(stream, subtask=None, *, lim):
+            [n] = stream.read.int(lim.n).eoln
+            [a] = stream.read.ints(n, lim.a).eoln
+
+        multi_pass = validator(bounds=bounds, subtasks=subtasks)(validate)
+        single_pass = validator(bounds=bounds, subtasks=subtasks, single_pass_detection=True)(validate)
+        for data, expected in [
+            ('2\n3 4\n', ['1', '2', '3']),
+            ('2\n3 6\n', ['1', '3']),
+            ('3\n3 4 5\n', ['2', '3']),
+            ('3\n3 4 101\n', []),
+            ('2\n3 4 \n', []),
+        ]:
+            for validate in [multi_pass, single_pass]:
+                self.assertEqual(list(detect_subtasks(validate, io.StringIO(data), ['3', '1', '2'])), sorted(expected, key='312'.index))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+
+from .base import FilesTestCase
+from ...script.details import ExpectedSolution
+from ...script.script import _verify_failed, _verify_groups, _verify_needed
+
+class TestVerify(FilesTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write('sol.py', '')
+
+    def solution(self, expected=None):
+        return ExpectedSolution({'program': 'sol.py', **({'expected': expected} if expected is not None else {})},
+                relpath=self.dir.name)
+
+    def test_expected_for(self):
+        self.assertEqual(self.solution().expected_for('*'), {'AC'})
+        self.assertEqual(self.solution().expected_for(3), {'AC'})
+        self.assertEqual(self.solution(['WA', 'TLE']).expected_for(1), {'WA', 'TLE'})
+
+        # subtask ids may be strings (as json keys) or ints; '*' is for the rest
+        solution = self.solution({'1': 'AC', 2: ['WA', 'RE'], '*': 'TLE'})
+        self.assertEqual(solution.expected_for(1), {'AC'})
+        self.assertEqual(solution.expected_for(2), {'WA', 'RE'})
+        self.assertEqual(solution.expected_for(3), {'TLE'})
+        self.assertEqual(solution.expected_for('*'), {'TLE'})
+
+        # no expectation for the subtasks that aren't listed
+        solution = self.solution({'2': 'AC'})
+        self.assertEqual(solution.expected_for(2), {'AC'})
+        self.assertIsNone(solution.expected_for(1))
+        self.assertIsNone(solution.expected_for('*'))
+
+    def test_invalid(self):
+        for solution in ['sol.py', {'expected': 'AC'}]:
+            with self.assertRaises(TypeError):
+                ExpectedSolution(solution, relpath=self.dir.name)
+        for expected in ['OK', [], ['AC', 'XX'], {'1': 'OK'}]:
+            with self.assertRaises(ValueError):
+                self.solution(expected)
+
+    def test_groups(self):
+        inputs = ['a.in', 'b.in', 'c.in']
+        self.assertEqual(_verify_groups(inputs), ({'a.in': ['*'], 'b.in': ['*'], 'c.in': ['*']}, ['*']))
+        self.assertEqual(_verify_groups(inputs, {'a.in': ['1', '2'], 'b.in': ['2'], 'c.in': ['10']}, {'10', '2', '1'}),
+                ({'a.in': [1, 2], 'b.in': [2], 'c.in': [10]}, [1, 2, 10]))
+
+    def test_needed(self):
+        # subtask 1 is in files 0 to 2, subtask 2 in files 1 and 3, and subtask 3 (no expectation) in file 3
+        groups_of = [[1], [1, 2], [1], [2, 3]]
+        verdicts = ['WA', 'AC', 'WA', 'AC']
+        solution = self.solution({'1': 'WA', '2': 'AC'})
+        for stops_early, run in [
+            # !min: subtask 1 fails on file 0, so file 2 is skipped, but file 1 is still needed for subtask 2
+            (True, [0, 1, 3]),
+            (False, [0, 1, 2, 3]),
+        ]:
+            with self.subTest(stops_early=stops_early):
+                got = {}
+                ran = []
+                for index, (groups, verdict) in enumerate(zip(groups_of, verdicts)):
+                    if _verify_needed(solution, groups, got, stops_early):
+                        ran.append(index)
+                        if verdict != 'AC': _verify_failed(got, groups, index, verdict)
+                self.assertEqual(ran, run)
+                self.assertEqual(got, {1: (0, 'WA')})
+
+        # once a !min group has failed, its files are skipped; without !min, they're still run
+        failures = {}
+        _verify_failed(failures, [1], 0, 'WA')
+        self.assertEqual(_verify_needed(solution, [1], failures, True), [])
+        self.assertEqual(_verify_needed(solution, [1], failures, False), [1])
+        self.assertEqual(_verify_needed(solution, [1, 2], failures, True), [2])
+        # no expectation, so no need to run
+        self.assertEqual(_verify_needed(solution, [3], {}, False), [])
+
+    def test_first_failure(self):
+        # files may finish in any order, but the verdict of a group is that of its first failing file
+        failures = {}
+        _verify_failed(failures, [1, 2], 5, 'TLE')
+        _verify_failed(failures, [1], 3, 'WA')
+        _verify_failed(failures, [2], 7, 'RE')
+        self.assertEqual(failures, {1: (3, 'WA'), 2: (5, 'TLE')})
+
+if __name__ == '__main__':
+    unittest.main()
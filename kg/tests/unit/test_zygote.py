@@ -0,0 +1,150 @@
+import os
+import signal
+import subprocess
+import sys
+import unittest
+from subprocess import PIPE, TimeoutExpired
+from unittest import mock
+
+from .base import FilesTestCase, this_kg_environ
+from ...script import programs
+from ...script.zygote import ForkServer, ForkServerError
+
+VALIDATOR = '''\
+from sys import *
+from kg.validators import *
+
+bounds = {'n': 1 <= +Var <= 10}
+
+subtasks = {
+    '1': {'n': 1 <= +Var <= 1},
+    '2': {'n': 1 <= +Var <= 5},
+    '3': {},
+}
+
+@validator(bounds=bounds, subtasks=subtasks)
+def validate(stream, subtask=None, *, lim):
+    [n] = stream.read.int(lim.n).eoln
+
+if __name__ == '__main__':
+    validate_or_detect_subtasks(validate, subtasks, stdin)
+'''
+
+CHECKER = '''\
+from kg.checkers import *
+
+@checker(extra_chars_allowed=['input', 'output', 'judge'])
+def check(input_stream, output_stream, judge_stream, **kwargs):
+    if [*output_stream] != [*judge_stream]: raise Wrong("The outputs differ")
+    return 1.0
+
+if __name__ == '__main__':
+    check_files(check)
+'''
+
+SCRIPT = '''\
+import sys
+print(input()[::-1])
+print("to stderr", file=sys.stderr)
+sys.stdout = open('other.txt', 'w')
+print("to other.txt")
+sys.__stdout__.write("to the original stdout\\n")
+exit(3)
+'''
+
+@unittest.skipUnless(ForkServer.supported(), "needs fork")
+class TestForkServer(FilesTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # the server and the programs must use this kg, and block-buffered output, like a fresh python3 would
+        environ = {**os.environ, **this_kg_environ()}
+        environ.pop('PYTHONUNBUFFERED', None)
+        patch = mock.patch.dict(os.environ, environ, clear=True)
+        patch.start()
+        cls.addClassCleanup(patch.stop)
+        cls.server = ForkServer(sys.executable)
+        cls.addClassCleanup(cls.server.close)
+
+    def assertSameRun(self, filename, *args, stdin):
+        ''' run the program with python3 and through the server; they should have the same outputs and return code '''
+        results = []
+        for popen in [subprocess.Popen, self.server.popen]:
+            with open(self.path(stdin)) as f, popen([sys.executable, self.path(filename), *args],
+                    stdin=f, stdout=PIPE, stderr=PIPE, cwd=self.dir.name) as process:
+                stdout, stderr = process.communicate(timeout=30)
+                results.append((stdout, stderr, process.returncode))
+        self.assertEqual(results[1], results[0])
+        return results[0]
+
+    def test_validator(self):
+        self.write('validator.py', VALIDATOR)
+        self.write('small.in', '1\n')
+        self.write('big.in', '7\n')
+        self.assertEqual(self.assertSameRun('validator.py', '--detect-subtasks', '1', '2', '3', stdin='small.in'),
+                (b'1 2 3\n', b'', 0))
+        self.assertEqual(self.assertSameRun('validator.py', '--detect-subtasks', '1', '2', '3', stdin='big.in')[0],
+                b'3\n')
+        self.assertNotEqual(self.assertSameRun('validator.py', '2', stdin='big.in')[2], 0)
+
+    def test_checker(self):
+        # like kg test runs it
+        self.write('checker.py', CHECKER)
+        files = [self.write('in', '1\n'), self.write('out', '1\n'), self.write('ans', '2\n')]
+        stdout, stderr, returncode = self.assertSameRun('checker.py', *files, 'result', '-t', '3', '-v', stdin='in')
+        self.assertNotEqual(returncode, 0)
+        self.assertIn(b'The outputs differ', stdout)
+        self.assertIn('Wrong answer', self.read('result'))
+        self.assertEqual(self.assertSameRun('checker.py', *files[:2], files[1], 'result', stdin='in')[2], 0)
+
+    def test_script(self):
+        self.write('script.py', SCRIPT)
+        self.write('in', 'abc\n')
+        self.assertEqual(self.assertSameRun('script.py', stdin='in'),
+                (b'cba\nto the original stdout\n', b'to stderr\n', 3))
+        self.assertEqual(self.read('other.txt'), 'to other.txt\n')
+
+        # a syntax error has no traceback
+        self.write('bad.py', 'x = (\n')
+        self.assertEqual(self.assertSameRun('bad.py', stdin='in')[2], 1)
+
+    def test_timeout(self):
+        self.write('sleep.py', 'import time\nprint("started", flush=True)\ntime.sleep(60)\n')
+        with self.server.popen([sys.executable, self.path('sleep.py')],
+                stdin=subprocess.DEVNULL, stdout=PIPE, stderr=PIPE, cwd=self.dir.name) as process:
+            with self.assertRaises(TimeoutExpired):
+                process.communicate(timeout=0.5)
+            process.kill()
+            stdout, stderr = process.communicate()
+        self.assertEqual(process.returncode, -signal.SIGKILL)
+        self.assertEqual(stdout, b'started\n')
+        cpu_time, max_memory = process.usage()
+        self.assertLess(cpu_time, 5)
+
+    def test_bad_helpers(self):
+        # helper files that do things when imported (e.g., without an "if __name__ == '__main__'" guard)
+        helpers = [
+            self.write('reads.py', 'n = int(input())\n'),
+            self.write('prints.py', 'print("hello")\nVALUE = 1\n'),
+            self.write('exits.py', 'exit(1)\n'),
+        ]
+        self.write('script.py', 'import prints\nprint(prints.VALUE + int(input()))\n')
+        self.write('in', '2\n')
+        with ForkServer(sys.executable, helpers, timeout=30) as server:
+            with open(self.path('in')) as f, server.popen([sys.executable, self.path('script.py')],
+                    stdin=f, stdout=PIPE, stderr=PIPE, cwd=self.dir.name) as process:
+                stdout, stderr = process.communicate(timeout=30)
+        # the helper printed "hello" when the server imported it, not now
+        self.assertEqual((stdout, stderr, process.returncode), (b'3\n', b'', 0))
+
+    def test_fallback(self):
+        # without the server, the programs just run normally
+        with mock.patch.object(programs, 'ForkServer', side_effect=ForkServerError("failed")) as server, \
+                mock.patch.object(programs, 'warn_print') as warn_print:
+            server.supported.return_value = True
+            with programs.use_fork_server():
+                self.assertIsNone(programs._fork_server)
+        warn_print.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
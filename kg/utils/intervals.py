@@ -1,4 +1,4 @@
-import collections, collections.abc, enum, functools, itertools, operator
+import bisect, collections, collections.abc, enum, functools, itertools, operator
 
 from .utils import * ### @import
 
@@ -68,7 +68,7 @@ class Intervals(collections.abc.Hashable): ### @@ rem {
     """
     ### @@ }
 
-    __slots__ = '_bds', '_hash', '_complement'
+    __slots__ = '_bds', '_hash', '_complement', '_flat'
 
     def __init__(self, bounds, *, _complement=None):
         self._bds = []
@@ -92,6 +92,7 @@ class Intervals(collections.abc.Hashable): ### @@ rem {
             raise ValueError("The intervals must be a subset of [-inf, +inf]")
         self._hash = None
         self._complement = _complement
+        self._flat = None
         super().__init__()
 
     def __hash__(self):
@@ -107,29 +108,30 @@ class Intervals(collections.abc.Hashable): ### @@ rem {
     def __ne__(self, other):
         return not (self == other)
 
-    def __contains__(self, value):
-
-        if not self._bds:
-            return False
-        if not Intervals.satisfies(value, *self._bds[0]):
-            return False
-        if not Intervals.satisfies(value, *self._bds[-1]):
-            return False
-
-        # binary search to find the interval containing it ### @rem
-        l, r = 0, len(self._bds)
-        while r - l > 2:
-            m = l + r >> 2 << 1 # must be even
-            if Intervals.satisfies(value, *self._bds[m]):
-                l = m
-            elif Intervals.satisfies(value, *self._bds[m - 1]):
-                r = m
-            else:
-                # it falls in between intervals ### @rem
-                return False
+    def _flatten(self):
+        ### @@ rem {
+        # The bound values, and whether each bound comes before a value equal to it (i.e., UE and LI) in the
+        # sorted order. A value is in the Intervals iff an odd number of bounds come before it.
+        ### @@ }
+        if self._flat is None:
+            self._flat = [bound for bound, btype in self._bds], [btype < 0 for bound, btype in self._bds]
+        return self._flat
 
-        assert r - l == 2 ### @rem
-        return True
+    def __contains__(self, value):
+        bounds, before = self._flat or self._flatten()
+        i = bisect.bisect_left(bounds, value)
+        # at most two bounds can be equal to the value ### @rem
+        while i < len(bounds) and before[i] and bounds[i] == value: i += 1
+        return i % 2 == 1
+
+    def contains_all(self, values):
+        """whether all the values are in these Intervals""" ### @rem
+        bounds, before = self._flat or self._flatten()
+        if len(bounds) == 2:
+            # a single interval, so only the extremes matter ### @rem
+            values = list(values)
+            return not values or min(values) in self and max(values) in self
+        return all(value in self for value in values)
 
     def __and__(self, other):
         """intersection of sets""" ### @rem
@@ -460,6 +462,7 @@ def test_some_stuff():
         print(ex)
         for v in qvals:
             assert check(v) == (v in interv)
+        assert all(map(check, qvals)) == interv.contains_all(qvals)
 
         if rand.random() < 0.01:
             _intersect_intervals.cache_clear()
@@ -24,6 +24,24 @@ def strict_check_range(x, *args, type="Number"):
         raise ParsingError(f"Invalid arguments for range check: {args}")
     return x
 
+def all_in_range(xs, *args): ### @@ rem {
+    ''' Check if strict_check_range(x, *args) would succeed for every x in the nonempty list xs.
+
+    For plain ranges (and Intervals that consist of a single interval), only the min and max are checked.
+    '''
+    ### @@ }
+    if len(args) == 2:
+        l, r = args
+        return l <= min(xs) and max(xs) <= r
+    elif len(args) == 1:
+        r, = args
+        if isinstance(r, Intervals):
+            return r.contains_all(xs)
+        else:
+            return 0 <= min(xs) and max(xs) < r
+    else:
+        return not args
+
 
 _int_re = re.compile(r'^(?:0|-?[1-9]\d*)\Z')
 intchars = {'-', *string.digits}
@@ -1,4 +1,5 @@
-import collections, enum, functools, io
+import codecs, collections, enum, functools, io, mmap, re
+from array import array
 
 from .parsers import * ### @import
 from .utils import * ### @import
@@ -8,6 +9,27 @@ class NoLineError(StreamError): ...
 class NoTokenError(StreamError): ...
 class NoCharError(StreamError): ...
 
+@functools.lru_cache(maxsize=64)
+def _token_run(count):
+    # 'count' tokens separated by single spaces ### @rem
+    return re.compile(rf'[^ \n]+(?: [^ \n]+){{{count - 1}}}')
+
+@functools.lru_cache(maxsize=None)
+def _char_class(chars, *, negate=False):
+    # EOF (and anything that isn't a single character) never appears in a line ### @rem
+    chars = sorted(ch for ch in chars if len(ch) == 1)
+    if not chars: return re.compile(r'(?s).' if negate else r'(?!)')
+    return re.compile('[' + '^'*negate + ''.join(map(re.escape, chars)) + ']')
+
+@functools.lru_cache(maxsize=None)
+def _token_pattern(skip_spaces, skip_eolns, ends):
+    # skip whitespace, then capture the token ### @rem
+    skip = SPACE * skip_spaces + EOLN * skip_eolns
+    ends = ''.join(sorted(ch for ch in ends if len(ch) == 1))
+    return re.compile((f'[{re.escape(skip)}]*' if skip else '') + (f'([^{re.escape(ends)}]*)' if ends else r'([\s\S]*)'))
+
+_int_run_re = re.compile(r'(?:0|-?[1-9][0-9]*)(?: (?:0|-?[1-9][0-9]*))*')
+
 class ISMode(enum.Enum):
     LINES = 'lines'
     TOKENS = 'tokens'
@@ -24,6 +46,7 @@ ISTREAM_DEFAULTS = {
     'token_skip_spaces': False,
     'token_skip_eolns': False,
     'eoln_skip_spaces': False,
+    'use_mmap': False,
 }
 
 ISTREAM_MODE_DEFAULTS = {
@@ -46,6 +69,66 @@ ISTREAM_MODE_DEFAULTS = {
 }
 
 
+class MmapLineReader:
+    ### @@ rem {
+    # A line source for IStreamState backed by a memory-mapped file. Lines are sliced out of the mapping a block at a
+    # time and only decoded when they're reached, so a huge file is never copied into memory. Blocks always end at a
+    # newline, so multibyte characters and '\r\n' pairs are never split, and the lines (including universal newline
+    # translation and the UnicodeDecodeError for bad encoding) are the same as what text mode's readline gives.
+    ### @@ }
+    _CHUNK = 1 << 20
+
+    def __init__(self, data, encoding):
+        self._data = data
+        self._encoding = encoding
+        self._pos = 0
+        self._lines = []
+        self._k = 0
+        super().__init__()
+
+    @classmethod
+    def from_file(cls, file):
+        ### @@ rem {
+        # Memory-map a text file that hasn't been read from yet, if it's a regular file with an encoding whose
+        # newlines can be found bytewise. Otherwise (pipes, empty files, etc.), return None.
+        ### @@ }
+        try:
+            encoding = codecs.lookup(file.encoding).name
+            if encoding not in {'ascii', 'utf-8'} or file.errors != 'strict' or file.tell() != 0: return None
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, LookupError, OSError, TypeError, ValueError):
+            return None
+        return cls(data, encoding)
+
+    def readable(self): return True
+
+    def isatty(self): return False
+
+    def close(self): self._data.close()
+
+    def _fill(self):
+        pos = self._pos
+        if pos >= len(self._data): return False
+        end = self._data.rfind(b'\n', pos, pos + self._CHUNK) + 1 or self._data.find(b'\n', pos + self._CHUNK) + 1
+        if not end: end = len(self._data)
+        self._pos = end
+        text = self._data[pos:end].decode(self._encoding)
+        if '\r' in text: text = text.replace('\r\n', '\n').replace('\r', '\n')
+        self._lines = text.split('\n')
+        self._k = 0
+        return True
+
+    def readline(self):
+        # the last piece of a block is either empty or an unterminated last line ### @rem
+        while self._k >= len(self._lines) - 1:
+            if self._k == len(self._lines) - 1 and self._lines[self._k]:
+                self._k += 1
+                return self._lines[-1]
+            if not self._fill(): return ''
+        self._k += 1
+        return self._lines[self._k - 1] + EOLN
+
+
 class IStreamState:
     def __init__(self, file, *, exc=StreamError):
         self._file = file
@@ -82,6 +165,11 @@ class IStreamState:
         if not self.remaining(): raise RuntimeError("Cannot peek buffer if all characters in the current line have been consumed")
         return self._buf[self._l][self._i]
 
+    def peek_char(self):
+        # like peek, but returns EOF if all characters in the current line have been consumed ### @rem
+        buf = self._buf[self._l]
+        return buf[self._i] if self._i < len(buf) else EOF
+
     def advance(self):
         if not self.remaining(): raise RuntimeError("Cannot advance buffer if all characters in the current line have been consumed")
         self._i += 1
@@ -92,10 +180,38 @@ class IStreamState:
         self._i = len(buf)
         return line
 
+    def match(self, pattern):
+        return pattern.match(self._buf[self._l], self._i)
+
+    def consume_to(self, i):
+        if not self._i <= i <= len(self._buf[self._l]): raise RuntimeError("Cannot consume buffer beyond the current line")
+        self._i = i
+
     def consume_until(self, ends):
         i = self._i
         buf = self._buf[self._l]
-        while self._i < len(buf) and buf[self._i] not in ends: self._i += 1
+        match = _char_class(frozenset(ends)).search(buf, i)
+        self._i = match.start() if match else len(buf)
+        return buf[i:self._i]
+
+    def consume_token(self, pattern):
+        ### @@ rem {
+        # Skip and consume a token using a pattern from _token_pattern. Returns None if nothing is left in the current
+        # line after skipping (in which case the token must be looked for in the next line).
+        ### @@ }
+        buf = self._buf[self._l]
+        match = pattern.match(buf, self._i)
+        if match.start(1) == len(buf):
+            self._i = len(buf)
+            return None
+        self._i = match.end(1)
+        return match.group(1)
+
+    def consume_while(self, chars):
+        i = self._i
+        buf = self._buf[self._l]
+        match = _char_class(frozenset(chars), negate=True).search(buf, i)
+        self._i = match.start() if match else len(buf)
         return buf[i:self._i]
 
     _DROP = 64
@@ -158,11 +274,28 @@ class InteractiveStream:
         # overwritten options ### @rem
         self._opts.update(options)
 
+        # resolve the options once, for the readers ### @rem
+        self._ignore_blank_lines = self._opts['ignore_blank_lines']
+        self._require_trailing_eoln = self._opts['require_trailing_eoln']
+        self._parse_validate = self._opts['parse_validate']
+        self._line_include_ends = self._opts['line_include_ends']
+        self._line_ignore_trailing_spaces = self._opts['line_ignore_trailing_spaces']
+        self._token_skip_spaces = self._opts['token_skip_spaces']
+        self._token_skip_eolns = self._opts['token_skip_eolns']
+        self._eoln_skip_spaces = self._opts['eoln_skip_spaces']
+
         self._token_ends = {SPACE, EOLN}
+        self._token_pattern = _token_pattern(bool(self._token_skip_spaces), bool(self._token_skip_eolns),
+                frozenset(self._token_ends))
+        self._next_item = self._next_token if self._mode == ISMode.TOKENS else self._next_line
         self._closed = False
         self._pending = None
 
-        self._buf = IStreamState(self._reader, exc=exc) if self._reader else None
+        self._source = self._reader
+        if self._reader and self._opts['use_mmap']:
+            self._source = MmapLineReader.from_file(self._reader) or self._reader
+
+        self._buf = IStreamState(self._source, exc=exc) if self._reader else None
         self._read = ChainRead(self)
 
         super().__init__()
@@ -185,16 +318,17 @@ class InteractiveStream:
             self._buf.future_commit()
             return res
 
-        if self._mode == ISMode.TOKENS:
-            try:
-                return self.read_token(exc=NoTokenError)
-            except NoTokenError as ex:
-                raise StopIteration from ex
-        else:
-            try:
-                return self.read_line(exc=NoLineError)
-            except NoLineError as ex:
-                raise StopIteration from ex
+        return self._next_item()
+
+    def _next_token(self):
+        res = self._scan_token(self._token_pattern)
+        if res is None: raise StopIteration
+        return res
+
+    def _next_line(self):
+        res = self._scan_line(self._line_include_ends, self._line_ignore_trailing_spaces)
+        if res is None: raise StopIteration
+        return res
 
     def has_next(self):
         self._check_open()
@@ -251,11 +385,12 @@ class InteractiveStream:
             except BrokenPipeError: # silently allow broken pipe errors
                 pass
             finally:
+                if self._source is not self._reader: self._source.close()
                 self._closed = True # can only set this after closing
 
     def _buffer_line(self):
         buf = self._buf.next_line()
-        if self._opts['require_trailing_eoln'] and buf and not buf.endswith(EOLN):
+        if self._require_trailing_eoln and buf and not buf.endswith(EOLN):
             raise self.exc(f"trailing {stream_char_label(EOLN)} not found")
         return buf
 
@@ -264,27 +399,31 @@ class InteractiveStream:
         self._pending = None
 
         if include_ends is None:
-            include_ends = self._opts['line_include_ends']
+            include_ends = self._line_include_ends
         if ignore_trailing_spaces is None:
-            ignore_trailing_spaces = self._opts['line_ignore_trailing_spaces']
+            ignore_trailing_spaces = self._line_ignore_trailing_spaces
+
+        res = self._scan_line(include_ends, ignore_trailing_spaces)
+        if res is None: raise (exc or self.exc)("no line found")
+        return res
+
+    def _scan_line(self, include_ends, ignore_trailing_spaces):
+        # returns None if there are no more lines ### @rem
         if include_ends and ignore_trailing_spaces:
             raise ValueError("Cannot ignore trailing spaces if include_ends is true")
 
         while True:
-            if not self._buf.remaining() and not self._buffer_line(): raise (exc or self.exc)("no line found")
-
             line = self._buf.consume_line()
-            assert line
+            if not line:
+                if not self._buffer_line(): return None
+                line = self._buf.consume_line()
 
-            if line == EOLN and self._opts['ignore_blank_lines']: continue
+            if line == EOLN and self._ignore_blank_lines: continue
 
             # remove undesired trailing whitespace
             if not include_ends:
-                last = len(line)
-                if last and line[last - 1] == EOLN: last -= 1
-                if ignore_trailing_spaces:
-                    while last and line[last - 1] == SPACE: last -= 1
-                line = line[:last]
+                if line.endswith(EOLN): line = line[:-1]
+                if ignore_trailing_spaces: line = line.rstrip(SPACE)
 
             return line
 
@@ -292,44 +431,56 @@ class InteractiveStream:
         self._check_open()
         self._pending = None
 
-        if ends is None:
-            ends = self._token_ends
-        if skip_spaces is None:
-            skip_spaces = self._opts['token_skip_spaces']
-        if skip_eolns is None:
-            skip_eolns = self._opts['token_skip_eolns']
+        if ends is None and skip_spaces is None and skip_eolns is None:
+            pattern = self._token_pattern
+        else:
+            if ends is None:
+                ends = self._token_ends
+            if skip_spaces is None:
+                skip_spaces = self._token_skip_spaces
+            if skip_eolns is None:
+                skip_eolns = self._token_skip_eolns
+            pattern = _token_pattern(bool(skip_spaces), bool(skip_eolns), frozenset(force_to_set(ends)))
 
-        ends = force_to_set(ends)
+        res = self._scan_token(pattern)
+        if res is None: raise (exc or self.exc)("no token found")
+        if l is not None and len(res) not in l: raise self.exc(f"token too long! length must be in {l}")
+        return res
 
-        if not self._buf.remaining(): self._buffer_line()
 
-        # skip whitespace ### @rem
-        while self._buf.remaining() and (
-            skip_spaces and self._buf.peek() == SPACE or
-            skip_eolns  and self._buf.peek() == EOLN):
-            self._buf.advance()
-            if not self._buf.remaining(): self._buffer_line()
+    def _scan_token(self, pattern):
+        # returns None if there are no more tokens ### @rem
+        while True:
+            res = self._buf.consume_token(pattern)
+            if res is not None: return res
+            # everything skipped ### @rem
+            if not self._buffer_line(): return None
 
-        # everything skipped ### @rem
-        if not self._buf.remaining(): raise (exc or self.exc)("no token found")
+    def _skip_to_token(self, skip_spaces, skip_eolns):
+        if not self._buf.remaining(): self._buffer_line()
 
-        res = self._buf.consume_until(ends)
-        if l is not None and len(res) not in l: raise self.exc(f"token too long! length must be in {l}")
-        return res
+        # skip whitespace, a line at a time ### @rem
+        skip = {SPACE} if skip_spaces else set()
+        if skip_eolns: skip.add(EOLN)
+        while skip and self._buf.remaining():
+            self._buf.consume_while(skip)
+            if self._buf.remaining(): break
+            self._buffer_line()
 
+        return self._buf.remaining()
 
     def read_spaces(self):
         self._check_open()
         self._pending = None
         
-        while self._buf.remaining() and self._buf.peek() == SPACE: self._buf.advance()
+        self._buf.consume_while(SPACE)
 
 
     def read_char(self, target, *, skip_spaces=False, exc=None):
         self._check_open()
         self._pending = None
 
-        if skip_spaces: self.read_spaces()
+        if skip_spaces and self._buf.peek_char() == SPACE: self._buf.consume_while(SPACE)
 
         if isinstance(target, str):
             if len(target) > 1: raise ValueError(f"Invalid argument for read_char: {target!r}")
@@ -339,8 +490,10 @@ class InteractiveStream:
             target = force_to_set(target)
             ret = True
 
-        if not self._buf.remaining(): self._buffer_line()
-        ch = self._buf.peek() if self._buf.remaining() else EOF
+        ch = self._buf.peek_char()
+        if ch == EOF:
+            self._buffer_line()
+            ch = self._buf.peek_char()
         if ch not in target:
             raise (exc or self.exc)(f"{{{', '.join(map(stream_char_label, target))}}} expected but {stream_char_label(ch)} found")
 
@@ -350,14 +503,14 @@ class InteractiveStream:
         if ret: return ch
 
     def _read_eoln_or_eof(self, exc=None):
-        return self.read_char({EOLN, EOF}, skip_spaces=self._opts['eoln_skip_spaces'], exc=exc)
+        return self.read_char({EOLN, EOF}, skip_spaces=self._eoln_skip_spaces, exc=exc)
 
     def read_eoln(self, *, skip_spaces=None, exc=None):
-        if skip_spaces is None: skip_spaces = self._opts['eoln_skip_spaces']
+        if skip_spaces is None: skip_spaces = self._eoln_skip_spaces
         return self.read_char(EOLN, skip_spaces=skip_spaces, exc=exc)
 
     def read_eof(self, *, skip_spaces=None, exc=None):
-        if skip_spaces is None: skip_spaces = self._opts['eoln_skip_spaces']
+        if skip_spaces is None: skip_spaces = self._eoln_skip_spaces
         return self.read_char(EOF, skip_spaces=skip_spaces, exc=exc)
 
     def read_space(self, exc=None):
@@ -375,13 +528,46 @@ class InteractiveStream:
                 for ch in sep: self.read_char(ch, exc=cexc)
         for ch in end: self.read_char(ch, exc=cexc)
 
-    def read_ints(self, *a, **kw): return self._do_multiple(self.read_int, *a, **kw)
     def read_tokens(self, *a, **kw): return self._do_multiple(self.read_token, *a, **kw)
     def read_reals(self, *a, **kw): return self._do_multiple(self.read_real, *a, **kw)
 
+    def read_ints(self, count, *args, as_array=False, **kwargs):
+        sep = kwargs.get('sep', [SPACE])
+        res = None
+        if (count > 0 and kwargs.keys() <= {'sep', 'end', 'cexc', 'validate'} and args != ('str',)
+                and isinstance(sep, (str, list, tuple)) and len(sep) == 1 and sep[0] == SPACE):
+            res = self._read_int_run(count, args, validate=kwargs.get('validate'))
+        if res is None:
+            res = self._do_multiple(self.read_int, count, *args, **kwargs)
+        else:
+            for ch in kwargs.get('end', []): self.read_char(ch, exc=kwargs.get('cexc'))
+        return array('q', res) if as_array else res
+
+    def _read_int_run(self, count, args, *, validate=None):
+        ### @@ rem {
+        # Read 'count' ints separated by single spaces all at once, if they're all on the current line. Otherwise,
+        # or if they're not all valid, no token is consumed and None is returned, so that the caller can read them one
+        # by one instead (and fail with the proper error).
+        ### @@ }
+        self._check_open()
+        self._pending = None
+        if validate is None: validate = self._parse_validate
+
+        if not self._skip_to_token(self._token_skip_spaces, self._token_skip_eolns): return None
+        match = self._buf.match(_token_run(count))
+        if not match: return None
+        if validate and not _int_run_re.fullmatch(match.group()): return None
+        try:
+            res = list(map(int, match.group().split(SPACE)))
+        except ValueError:
+            return None
+        if not all_in_range(res, *args): return None
+        self._buf.consume_to(match.end())
+        return res
+
 
     def read_int(self, *args, validate=None, **kwargs):
-        if validate is None: validate = self._opts['parse_validate']
+        if validate is None: validate = self._parse_validate
 
         # TODO use inspect.signature or something ### @rem
         int_kwargs = {kw: kwargs.pop(kw) for kw in ('as_str',) if kw in kwargs}
@@ -392,7 +578,7 @@ class InteractiveStream:
 
 
     def read_real(self, *args, validate=None, **kwargs):
-        if validate is None: validate = self._opts['parse_validate']
+        if validate is None: validate = self._parse_validate
 
         # TODO use inspect.signature or something ### @rem
         real_kwargs = {kw: kwargs.pop(kw) for kw in (
@@ -536,7 +722,7 @@ class TextIOPair(io.TextIOBase): ### @@ rem {
 
 ### @@rem {
 def test_some_stuff():
-    import io, itertools
+    import io, itertools, types
 
 
 
@@ -818,6 +1004,13 @@ def test_some_stuff():
             self.read_char(SPACE)
 
 
+    # give the reference classes the qualified names of the real ones, since newer Pythons put those in the messages of
+    # TypeErrors (e.g., for a missing argument), and the messages are compared exactly
+    for cls in [TEST_IStreamState, TEST_InteractiveStream]:
+        cls.__qualname__ = cls.__name__.removeprefix('TEST_')
+        for attr in vars(cls).values():
+            if isinstance(attr, types.FunctionType): attr.__qualname__ = f'{cls.__qualname__}.{attr.__name__}'
+
 
 
 
@@ -1096,7 +1289,7 @@ def test_some_stuff():
                 kwargs['skip_spaces'] = rand.choice([True, False, None])
             if rand.random() < 0.3:
                 kwargs['skip_eolns'] = rand.choice([True, False, None])
-            return lambda stream: stream.read_line(*args, **kwargs)
+            return lambda stream: stream.read_token(*args, **kwargs)
 
         def make_read_char():
             # target, skip_spaces=False
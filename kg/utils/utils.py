@@ -214,7 +214,7 @@ def stream_char_label(ch):
     return repr(ch)
 
 def force_to_set(s):
-    if not isinstance(s, collections.abc.Set):
+    if type(s) is not set and type(s) is not frozenset and not isinstance(s, collections.abc.Set):
         s = frozenset(s)
         ### @@rem {
         if not force_to_set.warned:
@@ -1,4 +1,5 @@
-import argparse, functools, io, itertools, re, sys
+import argparse, codecs, collections, functools, io, itertools, mmap, operator, re, sys
+from array import array
 
 from .utils import * ### @import
 from .utils.intervals import * ### @import
@@ -6,20 +7,93 @@ from .utils.parsers import * ### @import
 
 _patterns = functools.lru_cache(maxsize=None)(re.compile)
 
+@functools.lru_cache(maxsize=None)
+def _char_class(chars, *, negate=False, binary=False):
+    # EOF (and anything that isn't a single character) can't be matched by a character class ### @rem
+    # binary streams are pure ASCII, so other characters can't appear there anyway ### @rem
+    chars = sorted(ch for ch in chars if len(ch) == 1 and (not binary or ch.isascii()))
+    if not chars: pattern = r'(?s).' if negate else r'(?!)'
+    else: pattern = '[' + '^'*negate + ''.join(map(re.escape, chars)) + ']'
+    return re.compile(pattern.encode('ascii') if binary else pattern)
+
+@functools.lru_cache(maxsize=None)
+def _until_run(ends, charset, binary):
+    return (
+        _char_class(ends, binary=binary),
+        _char_class(charset, negate=True, binary=binary) if charset else None,
+        EOF not in ends,
+        bool(charset) and EOF not in charset,
+    )
+
+@functools.lru_cache(maxsize=None)
+def _while_run(charset, ends, binary):
+    return (
+        _char_class(charset, negate=True, binary=binary),
+        _char_class(ends & charset, binary=binary) if ends & charset else None,
+        EOF in charset,
+        EOF in ends,
+    )
+
+@functools.lru_cache(maxsize=64)
+def _int_run(sep, count, binary):
+    ### @@ rem {
+    # A loose pattern for a run of up to 'count' int-like tokens separated by 'sep' (to know how much to buffer),
+    # and a strict one for exactly 'count' valid int tokens.
+    ### @@ }
+    sep = re.escape(sep)
+    tok = r'(?:0|-?[1-9][0-9]*)'
+    patterns = f'[-0-9]+(?:{sep}[-0-9]+){{0,{count - 1}}}', f'{tok}(?:{sep}{tok}){{{count - 1}}}'
+    return tuple(re.compile(pattern.encode('ascii') if binary else pattern) for pattern in patterns)
+
+# non-ASCII bytes, and carriage returns (which text mode translates) ### @rem
+_not_plain_ascii = re.compile(rb'[^\x00-\x7f]|\r')
+
+def _mmap_ascii(file):
+    ### @@ rem {
+    # Memory-map a file that hasn't been read from yet, if it's a regular file whose contents would be read exactly
+    # the same in text mode. Otherwise (pipes, non-ASCII data, etc.), return None.
+    ### @@ }
+    try:
+        if codecs.lookup(file.encoding).name not in {'ascii', 'utf-8'} or file.tell() != 0: return None
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, LookupError, OSError, TypeError, ValueError):
+        return None
+    if _not_plain_ascii.search(data):
+        data.close()
+        return None
+    return data
+
 
 class ValidationError(Exception): ...
 class ValidationStreamError(Exception): ... # TODO unify with streams.StreamError
 
+_INT64_MIN, _INT64_MAX = -1 << 63, (1 << 63) - 1
+
+def _int64_bounds(args):
+    # whether every int that satisfies the bounds fits in an array('q')
+    if len(args) == 2:
+        l, r = args
+    elif len(args) == 1 and isinstance(args[0], Intervals):
+        l, r = args[0].lower_bound, args[0].upper_bound
+    elif len(args) == 1:
+        l, r = 0, args[0] - 1
+    else:
+        return False
+    return _INT64_MIN <= l and r <= _INT64_MAX
 
 # TODO needs unification with the other streams   ### @ rem
 class StrictInputStream:
+    _CHUNK = 1 << 16
+    _binary = False
+
     def __init__(self, file, *, interactive=False):
         self.last = None
-        self.next = None
         # NOTE: in the future, if we want to handle OS-based newlines, this step needs to be reconsidered ### @rem
-        if not interactive and not isinstance(file, io.StringIO):
-            file = io.StringIO(file.read())
         self.file = file
+        self._interactive = interactive
+        self._buf = ''
+        self._pos = 0
+        self._exhausted = False
         # self._found = {}  # TODO add labels ### @rem
         self._read = ChainRead(self)
         super().__init__()
@@ -28,23 +102,70 @@ class StrictInputStream:
     def from_string(self, s):
         return StrictInputStream(io.StringIO(s))
 
+    @classmethod
+    def from_file(self, file, *, interactive=False, use_mmap=False):
+        ### @@ rem {
+        # With use_mmap, validate the raw bytes of the file directly, if possible. Only the returned tokens are
+        # decoded, so the input is never held in memory as text. Falls back to a normal stream otherwise.
+        ### @@ }
+        if use_mmap and not interactive:
+            data = _mmap_ascii(file)
+            if data is not None: return MmapInputStream(file, data)
+        return StrictInputStream(file, interactive=interactive)
+
     ### @@ rem {
     # def __getitem__(self, key): return self._found[key]
     ### @@ }
 
+    def close(self):
+        # the file belongs to the caller ### @rem
+        pass
+
+    def _fill(self):
+        ### @@ rem {
+        # Append the next chunk of the file to the buffer, dropping the consumed part. The chunk size grows with the
+        # pending part so that a very long run is buffered in O(n) total. In interactive mode, we read one character
+        # at a time so that we never block waiting for data that isn't needed yet.
+        ### @@ }
+        if self._exhausted: return False
+        data = self.file.read(1 if self._interactive else max(self._CHUNK, len(self._buf) - self._pos))
+        if not data:
+            self._exhausted = True
+            return False
+        self._buf = self._buf[self._pos:] + data
+        self._pos = 0
+        return True
+
+    def _consume_to(self, i):
+        if i > self._pos:
+            self.last = self._buf[i - 1]
+            self._pos = i
+
+    def _slice(self, i, j):
+        return self._buf[i:j]
+
     def _next_char(self):
         if self.last == EOF: raise ValidationStreamError("Read past EOF")
-        if self.next is None: self.next = self.file.read(1)
-        self.last = self.next
-        self.next = None
+        if self._pos == len(self._buf) and not self._fill():
+            self.last = EOF
+        else:
+            self._consume_to(self._pos + 1)
         return self.last
 
     def peek_char(self):
         if self.last == EOF: raise ValidationStreamError("Peeked past EOF")
-        if self.next is None: self.next = self.file.read(1)
-        return self.next
-
-    def _read_cond(self, good, bad, *, l=None, n=None, maxn=None, include_end=False, _called="_read_cond"):
+        if self._pos == len(self._buf) and not self._fill(): return EOF
+        return self._buf[self._pos]
+
+    def _read_run(self, stop, bad, eof_good, eof_bad, *, l=None, n=None, maxn=None, include_end=False, _called="_read_run"):
+        ### @@ rem {
+        # Read the longest run of characters not matched by the 'stop' pattern. It's an error if a character in the
+        # run is matched by the 'bad' pattern. EOF is part of the run iff eof_good, and is bad iff eof_bad.
+        #
+        # This is equivalent to reading character by character and checking each one, in the following order:
+        # 'bad', then 'n', then 'maxn'. So the errors (and their messages) are exactly the same as that, but
+        # the boundaries are found with regex searches over whole chunks instead.
+        ### @@ }
         if maxn is None: maxn = (1 << 200) # 'infinite' enough for our purposes
         if l is not None:
             if not isinstance(l, Intervals):
@@ -52,45 +173,73 @@ class StrictInputStream:
             maxn = int(min(maxn, l.upper_bound + 1))
         if maxn < 0:
             raise ValueError(f"maxn must be nonnegative; got {maxn}")
-        res = io.StringIO()
-        lres = 0
-        while good(self.peek_char()):
-            if bad(self.peek_char()):
-                raise ValidationStreamError(f"Invalid character for {_called} detected: {stream_char_label(self.peek_char())}")
-            res.write(self._next_char())
-            lres += 1
-            if n is not None and lres > n: 
+        if self.last == EOF: raise ValidationStreamError("Peeked past EOF")
+
+        # characters beyond this index of the run are an error ### @rem
+        limit = maxn if n is None else min(n, maxn)
+
+        # find the end of the run, buffering only as much as needed ### @rem
+        buf, pos = self._buf, self._pos
+        end = pos
+        at_eof = False
+        while True:
+            match = stop.search(buf, end)
+            if match:
+                end = match.start()
+                break
+            end = len(buf)
+            if end - pos > limit: break
+            if not self._fill():
+                at_eof = True
+                break
+            end += self._pos - pos
+            buf, pos = self._buf, self._pos
+        run = end - pos
+
+        if bad is not None:
+            match = bad.search(buf, pos, pos + min(run, limit + 1))
+            if match:
+                self._consume_to(match.start())
+                raise ValidationStreamError(f"Invalid character for {_called} detected: {stream_char_label(self._slice(match.start(), match.end()))}")
+
+        if run > limit:
+            self._consume_to(pos + limit + 1)
+            if n is not None and n <= maxn:
+                raise ValidationStreamError(f"Expected exactly {n} characters, got more.")
+            raise ValidationStreamError(f"Took too many characters! Expected at most {maxn}")
+
+        if at_eof and eof_good:
+            # EOF is consumed as part of the run, so we will attempt to read past it ### @rem
+            self._consume_to(end)
+            if eof_bad:
+                raise ValidationStreamError(f"Invalid character for {_called} detected: {stream_char_label(EOF)}")
+            self.last = EOF
+            if n is not None and run + 1 > n:
                 raise ValidationStreamError(f"Expected exactly {n} characters, got more.")
-            if lres > maxn:
+            if run + 1 > maxn:
                 raise ValidationStreamError(f"Took too many characters! Expected at most {maxn}")
-        if n is not None and lres != n:
-            raise ValidationStreamError(f"Expected exactly {n} characters, got {lres}")
-        if l is not None and lres not in l:
-            raise ValidationStreamError(f"Expected length in {l}, got {lres}")
+            raise ValidationStreamError("Peeked past EOF")
+
+        res = self._slice(pos, end)
+        self._consume_to(end)
+        if n is not None and run != n:
+            raise ValidationStreamError(f"Expected exactly {n} characters, got {run}")
+        if l is not None and run not in l:
+            raise ValidationStreamError(f"Expected length in {l}, got {run}")
         if include_end:
-            res.write(self._next_char())
-        return res.getvalue()
+            res += self._next_char()
+        return res
 
     def read_until(self, ends, *, other_ends=set(), charset=set(), _called="read_until", **kwargs):
         ends = force_to_set(ends)
         other_ends = force_to_set(other_ends)
         charset = force_to_set(charset)
-        return self._read_cond(
-            lambda ch: ch not in ends and ch not in other_ends,
-            lambda ch: charset and ch not in charset,
-            _called=_called,
-            **kwargs,
-        )
+        return self._read_run(*_until_run(frozenset(ends | other_ends), frozenset(charset), self._binary), _called=_called, **kwargs)
 
     def read_while(self, charset, *, ends=set(), _called="read_while", **kwargs):
         ends = force_to_set(ends)
         charset = force_to_set(charset)
-        return self._read_cond(
-            lambda ch: ch in charset,
-            lambda ch: ch in ends,
-            _called=_called,
-            **kwargs,
-        )
+        return self._read_run(*_while_run(frozenset(charset), frozenset(ends), self._binary), _called=_called, **kwargs)
 
     def read_line(self, *, eof=False, _called="line", **kwargs):
         return self.read_until({EOLN, EOF} if eof else {EOLN}, _called=_called, **kwargs)
@@ -112,10 +261,43 @@ class StrictInputStream:
                 for ch in sep: self.read_char(ch)
         for ch in end: self.read_char(ch)
 
-    def read_ints(self, *a, **kw): return self._do_multiple(self.read_int, *a, **kw)
     def read_tokens(self, *a, **kw): return self._do_multiple(self.read_token, *a, **kw)
     def read_reals(self, *a, **kw): return self._do_multiple(self.read_real, *a, **kw)
 
+    def read_ints(self, count, *args, as_array=False, **kwargs):
+        if as_array and not _int64_bounds(args):
+            raise ValidationStreamError(f"as_array=True needs bounds within the 64-bit signed integers, got {args}")
+        sep = kwargs.get('sep', [SPACE])
+        res = None
+        if (count > 0 and kwargs.keys() <= {'sep', 'end'} and args != ('str',)
+                and isinstance(sep, (str, list, tuple)) and len(sep) == 1 and sep[0] in (SPACE, EOLN)):
+            res = self._read_int_run(count, sep[0], args)
+        if res is None:
+            res = self._do_multiple(self.read_int, count, *args, **kwargs)
+        else:
+            for ch in kwargs.get('end', []): self.read_char(ch)
+        return array('q', res) if as_array else res
+
+    def _read_int_run(self, count, sep, args):
+        ### @@ rem {
+        # Read 'count' ints separated by 'sep' all at once. If they're not all valid, nothing is consumed and None is
+        # returned, so that the caller can read them one by one instead (and fail with the proper error).
+        ### @@ }
+        if self.last == EOF: return None
+        loose, strict = _int_run(sep, count, self._binary)
+        while True:
+            buf, pos = self._buf, self._pos
+            match = loose.match(buf, pos)
+            if not (pos == len(buf) or match and match.end() == len(buf)) or not self._fill(): break
+        match = strict.match(buf, pos)
+        if not match: return None
+        end = match.end()
+        if end < len(buf) and self._slice(end, end + 1) not in (SPACE, EOLN): return None
+        res = list(map(int, self._slice(pos, end).split(sep)))
+        if not all_in_range(res, *args): return None
+        self._consume_to(end)
+        return res
+
 
     def read_int(self, *args, **kwargs):
         # TODO use inspect.signature or something ### @rem
@@ -169,40 +351,154 @@ class StrictInputStream:
     def read(self):
         return self._read
 
+
+class MmapInputStream(StrictInputStream):
+    ### @@ rem {
+    # A StrictInputStream over the bytes of a memory-mapped ASCII file. The whole file is the buffer, and characters
+    # are only decoded when they're returned.
+    ### @@ }
+    _binary = True
+
+    def __init__(self, file, data):
+        super().__init__(file)
+        self._buf = data
+        self._exhausted = True
+
+    def _consume_to(self, i):
+        if i > self._pos:
+            self.last = chr(self._buf[i - 1])
+            self._pos = i
+
+    def _slice(self, i, j):
+        return self._buf[i:j].decode('ascii')
+
+    def peek_char(self):
+        if self.last == EOF: raise ValidationStreamError("Peeked past EOF")
+        if self._pos == len(self._buf): return EOF
+        return chr(self._buf[self._pos])
+
+    def close(self):
+        self._buf.close()
+
+
 StrictStream = StrictInputStream
 # TODO add deprecation warnings? ### @rem
 
 
-def validator(f=None, *, bounds=None, subtasks=None, extra_chars_allowed=False, suppress_eof_warning=None):
+class _RecordingIntervals(Intervals):
+    # Intervals that remember every value tested for membership ### @rem
+    __slots__ = '_seen',
+
+    def __init__(self, intervals, seen):
+        super().__init__(intervals._bds)
+        self._seen = seen
+
+    def __contains__(self, value):
+        self._seen.add(value)
+        return super().__contains__(value)
+
+    def contains_all(self, values):
+        values = list(values)
+        self._seen.update(values)
+        return super().contains_all(values)
+
+def _recording_bounds(lims):
+    ### @@ rem {
+    # Combine the Bounds of several subtasks into one whose Intervals are the unions of theirs, and which records
+    # the values checked against each. Returns the Bounds and the recorded values, or None if the subtasks disagree
+    # on a non-Intervals value (because then the validator can't run on all of them at once).
+    ### @@ }
+    attrs = {}
+    seen = collections.defaultdict(set)
+    for name in {name for lim in lims for name in lim}:
+        values = [lim[name] for lim in lims if name in lim]
+        if all(isinstance(value, Intervals) for value in values):
+            attrs[name] = _RecordingIntervals(functools.reduce(operator.or_, values), seen[name])
+        elif all(not isinstance(value, Intervals) and value == values[0] for value in values):
+            attrs[name] = values[0]
+        else:
+            return None
+    return Bounds(attrs), seen
+
+
+def validator(f=None, *, bounds=None, subtasks=None, extra_chars_allowed=False, use_mmap=False, single_pass_detection=False,
+        suppress_eof_warning=None):
     ### @@ rem {
     if suppress_eof_warning is not None:
         warn("'suppress_eof_warning' is deprecated (and currently ignored); use 'extra_chars_allowed' instead")
     ### @@ }
 
+    def _lim(lim, subtask):
+        lim = Bounds(lim)
+        if bounds: lim &= Bounds(bounds)
+        if subtasks: lim &= Bounds(subtasks.get(subtask))
+        return lim
+
     def _d(f):
+        def _validate(stream, *args, **kwargs):
+            res = f(stream, *args, **kwargs)
+            if stream.last != EOF and not extra_chars_allowed:
+                stream.read_eof()
+            return res
+
         @functools.wraps(f)
         def _f(file, *args, force_subtask=False, interactive=False, **kwargs):
             if force_subtask and not (subtasks and 'subtask' in kwargs and kwargs['subtask'] in subtasks):
                 raise RuntimeError(f"invalid subtask given: {kwargs.get('subtask')!r}")
-            stream = StrictInputStream(file, interactive=interactive)
+            stream = StrictInputStream.from_file(file, interactive=interactive, use_mmap=use_mmap)
             if bounds is not None or subtasks is not None:
-                lim = Bounds(kwargs.get('lim'))
-                if bounds: lim &= Bounds(bounds)
-                if subtasks: lim &= Bounds(subtasks.get(kwargs['subtask']))
-                kwargs['lim'] = lim
-            res = f(stream, *args, **kwargs)
-            if stream.last != EOF and not extra_chars_allowed:
-                stream.read_eof()
+                kwargs['lim'] = _lim(kwargs.get('lim'), kwargs.get('subtask'))
+            try:
+                res = _validate(stream, *args, **kwargs)
+            finally:
+                stream.close()
             ### @@ if format == 'pc2' {
             if CURR_PLATFORM == 'pc2':
                 exit(42) # magic number to indicate successful validation (PC^2)
             ### @@ }
             return res
+
+        def _detect_subtasks(file, subs, *args, **kwargs):
+            ### @@ rem {
+            # Validate the file only once, against the union of all the subtasks' bounds, recording the values
+            # checked against each variable. Then a subtask is detected iff all those values satisfy its bounds.
+            # This assumes that the validator only depends on the subtask through 'lim'.
+            # Returns None if this can't be done, in which case nothing has been read from the file yet.
+            ### @@ }
+            subs = [sub for sub in subs if sub in subtasks]
+            lims = {sub: _lim(kwargs.get('lim'), sub) for sub in subs}
+            recording = _recording_bounds(list(lims.values()))
+            if recording is None: return None
+            lim, seen = recording
+            stream = StrictInputStream.from_file(file, use_mmap=use_mmap)
+            try:
+                _validate(stream, *args, **{**kwargs, 'subtask': None, 'lim': lim})
+            except Exception:
+                return []
+            finally:
+                stream.close()
+            def satisfies(sub):
+                for name in lim.accessed:
+                    if name not in lims[sub]: return False
+                for name, values in seen.items():
+                    if not values: continue
+                    intervals = lims[sub][name]
+                    if intervals != lim[name] and not all(value in intervals for value in values): return False
+                return True
+            return [sub for sub in subs if satisfies(sub)]
+
+        if subtasks and single_pass_detection:
+            _f.detect_subtasks = _detect_subtasks
         return _f
 
     return _d(f) if f is not None else _d
 
 def detect_subtasks(validate, file, subtasks, *args, **kwargs):
+    if hasattr(validate, 'detect_subtasks'):
+        detected = validate.detect_subtasks(file, subtasks, *args, **kwargs)
+        if detected is not None:
+            yield from detected
+            return
     file = io.StringIO(file.read())
     for subtask in subtasks:
         file.seek(0)